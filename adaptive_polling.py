@@ -0,0 +1,168 @@
+"""
+Adaptive Polling Module
+
+Plant die Abfrage der DECT-Geräte pro AIN anhand der beobachteten
+Veränderlichkeit: Thermostate, die sich nur alle paar zehn Minuten ändern,
+werden selten abgefragt, Steckdosen mit schaltenden Verbrauchern häufig.
+
+Pro AIN werden online (O(1) Speicher) eine Änderungsrate (EWMA) und Mittelwert/
+Varianz der Leistung (Welford) geführt. Nach einer Zustandsänderung (Schalten,
+Solltemperatur) fällt das Intervall sofort auf das Minimum zurück.
+"""
+import os
+import math
+import logging
+
+logger = logging.getLogger(__name__)
+
+ADAPTIVE_POLLING = os.getenv("ADAPTIVE_POLLING", "0").lower() in ("1", "true", "yes")
+DECT_POLL_MIN_INTERVAL = int(os.getenv("DECT_POLL_MIN_INTERVAL", "30"))
+DECT_POLL_MAX_INTERVAL = int(os.getenv("DECT_POLL_MAX_INTERVAL", "900"))
+# Leistungsänderungen unterhalb dieser Schwelle (mW) gelten nicht als Änderung
+DECT_POLL_POWER_TOLERANCE = int(os.getenv("DECT_POLL_POWER_TOLERANCE", "2000"))
+# Temperaturänderungen unterhalb dieser Schwelle (0,1 °C) gelten nicht als Änderung
+DECT_POLL_TEMPERATURE_TOLERANCE = int(os.getenv("DECT_POLL_TEMPERATURE_TOLERANCE", "5"))
+
+# Glättungsfaktor für die Änderungsrate und Faktoren für Backoff/Beschleunigung
+CHANGE_RATE_ALPHA = 0.3
+BACKOFF_FACTOR = 1.5
+SPEEDUP_FACTOR = 0.5
+
+# Felder, deren Änderung einen sofortigen Rückfall auf das Minimalintervall auslöst
+_DISCRETE_FIELDS = ("state", "switch_state", "hkr_set_temperature", "hkr_set_ventil_status")
+_TEMPERATURE_FIELDS = ("temperature_celsius", "hkr_is_temperature")
+
+
+def _as_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class DeviceStats:
+    """Laufende Statistik und Abfrageplanung für ein einzelnes Gerät."""
+
+    __slots__ = ("last", "interval", "next_due", "change_rate", "count", "mean", "m2", "failures")
+
+    def __init__(self, interval, now):
+        self.last = None
+        self.interval = interval
+        self.next_due = now
+        self.change_rate = 1.0
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.failures = 0
+
+    def add_power(self, power):
+        # Welford: Mittelwert und Varianz ohne Speicherung der Historie
+        self.count += 1
+        delta = power - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (power - self.mean)
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def volatility(self):
+        """Kennzahl 0..1 aus Änderungsrate und Variationskoeffizient der Leistung."""
+        cv = math.sqrt(self.variance) / self.mean if self.mean > 0 else 0.0
+        return max(self.change_rate, min(cv, 1.0))
+
+
+class AdaptivePollScheduler:
+    """Entscheidet pro AIN, wann das Gerät das nächste Mal abgefragt wird."""
+
+    def __init__(self, min_interval=DECT_POLL_MIN_INTERVAL, max_interval=DECT_POLL_MAX_INTERVAL):
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.devices = {}
+
+    def observe(self, device, now):
+        """
+        Verarbeitet einen normalisierten Messwert und plant die nächste Abfrage.
+
+        Args:
+            device (dict): Ergebnis von _normalize_device_info
+            now (float): Zeitpunkt der Messung (time.time())
+
+        Returns:
+            float: Neues Abfrageintervall in Sekunden
+        """
+        ain = device["ain"]
+        stats = self.devices.get(ain)
+        if stats is None:
+            stats = self.devices[ain] = DeviceStats(self.min_interval, now)
+
+        discrete, significant = self._classify_change(stats.last, device)
+        power = _as_number(device.get("multimeter_power"))
+        if power is not None:
+            stats.add_power(power)
+        if stats.last is not None:
+            stats.change_rate += CHANGE_RATE_ALPHA * ((1.0 if significant else 0.0) - stats.change_rate)
+
+        if discrete:
+            interval = self.min_interval
+        elif significant:
+            interval = stats.interval * SPEEDUP_FACTOR
+        else:
+            interval = stats.interval * BACKOFF_FACTOR
+        # Häufig veränderliche Geräte erreichen das Maximalintervall nie
+        ceiling = self.max_interval - (self.max_interval - self.min_interval) * stats.volatility
+        stats.interval = min(max(interval, self.min_interval), max(ceiling, self.min_interval))
+        if discrete and stats.last is not None:
+            logger.info("DECT %s: Zustandsänderung - Abfrageintervall auf %s s gesetzt", ain, self.min_interval)
+        stats.last = device
+        stats.failures = 0
+        stats.next_due = now + stats.interval
+        return stats.interval
+
+    def failed(self, ain, now):
+        """
+        Plant ein Gerät nach einer fehlgeschlagenen Abfrage erneut ein.
+
+        Die Wartezeit beginnt beim Minimalintervall und verdoppelt sich mit jedem
+        weiteren Fehlschlag bis zum Maximalintervall. Entfernt wird das Gerät erst,
+        wenn die vollständige Erkennung es nicht mehr findet.
+
+        Returns:
+            float: Wartezeit bis zur nächsten Abfrage in Sekunden
+        """
+        stats = self.devices.get(ain)
+        if stats is None:
+            return None
+        stats.failures += 1
+        delay = min(self.min_interval * 2 ** (stats.failures - 1), self.max_interval)
+        stats.next_due = now + delay
+        return delay
+
+    def _classify_change(self, previous, current):
+        """Liefert (diskrete Zustandsänderung, signifikante Änderung)."""
+        if previous is None:
+            return False, True
+        for field in _DISCRETE_FIELDS:
+            if previous.get(field) != current.get(field):
+                return True, True
+        old_power = _as_number(previous.get("multimeter_power"))
+        new_power = _as_number(current.get("multimeter_power"))
+        if old_power is not None and new_power is not None and abs(new_power - old_power) > DECT_POLL_POWER_TOLERANCE:
+            return False, True
+        for field in _TEMPERATURE_FIELDS:
+            old, new = _as_number(previous.get(field)), _as_number(current.get(field))
+            if old is not None and new is not None and abs(new - old) >= DECT_POLL_TEMPERATURE_TOLERANCE:
+                return False, True
+        return False, False
+
+    def due(self, now):
+        """AINs, deren nächster Abfragezeitpunkt erreicht ist."""
+        return [ain for ain, stats in self.devices.items() if stats.next_due <= now]
+
+    def next_due(self):
+        """Frühester geplanter Abfragezeitpunkt oder None ohne bekannte Geräte."""
+        return min((stats.next_due for stats in self.devices.values()), default=None)
+
+    def forget(self, ain):
+        self.devices.pop(ain, None)
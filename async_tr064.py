@@ -0,0 +1,66 @@
+"""
+Async TR-064 Module
+
+asyncio-Schicht über FritzConnection: unabhängige SOAP-Aufrufe eines Zyklus
+werden gleichzeitig abgesetzt, statt nacheinander auf jede Antwort zu warten.
+
+fritzconnection arbeitet blockierend über eine requests-Session (Keep-Alive,
+Digest-Auth-Zustand pro Thread). Die Aufrufe laufen deshalb in einem kleinen,
+dauerhaften Thread-Pool; ein Semaphor begrenzt die Anzahl gleichzeitiger
+Anfragen an die FritzBox, jeder Aufruf hat ein eigenes Timeout. Abgebrochene
+oder abgelaufene Aufrufe werden verworfen, ihr Ergebnis wird ignoriert.
+"""
+import os
+import asyncio
+import logging
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Maximale Anzahl gleichzeitiger TR-064-Anfragen (1 = klassisch nacheinander)
+TR064_CONCURRENCY = int(os.getenv("TR064_CONCURRENCY", "4"))
+# Timeout pro einzelnem Aufruf in Sekunden
+TR064_CALL_TIMEOUT = float(os.getenv("TR064_CALL_TIMEOUT", "10"))
+
+# Threads bleiben über Zyklen erhalten, damit Keep-Alive und Digest-Zustand wiederverwendet werden
+_executor = ThreadPoolExecutor(max_workers=max(TR064_CONCURRENCY, 1), thread_name_prefix="tr064")
+
+
+class AsyncFritzClient:
+    """Setzt call_action-Aufrufe einer FritzConnection nebenläufig und begrenzt ab."""
+
+    def __init__(self, fc, concurrency=TR064_CONCURRENCY, timeout=TR064_CALL_TIMEOUT, executor=None):
+        self.fc = fc
+        self.concurrency = max(concurrency, 1)
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._executor = executor or _executor
+
+    async def call(self, service, action, **kwargs):
+        """
+        Führt einen TR-064-Aufruf aus.
+
+        Raises:
+            asyncio.TimeoutError: wenn die FritzBox nicht innerhalb des Timeouts antwortet
+            Exception: Fehler aus fritzconnection (z. B. 713 bei ungültigem Index)
+        """
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._executor, partial(self.fc.call_action, service, action, **kwargs))
+            return await asyncio.wait_for(future, self.timeout)
+
+    async def gather(self, *calls):
+        """
+        Führt mehrere Aufrufe gleichzeitig aus.
+
+        Args:
+            *calls: Tupel (service, action, kwargs)
+
+        Returns:
+            list: Ergebnisse oder Exception-Objekte in Aufrufreihenfolge
+        """
+        return await asyncio.gather(
+            *(self.call(service, action, **(kwargs or {})) for service, action, kwargs in calls),
+            return_exceptions=True
+        )
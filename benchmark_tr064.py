@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+TR-064 Benchmark
+
+Vergleicht die Dauer eines Erfassungszyklus (get_fritz_data_async) mit
+nacheinander ausgeführten Aufrufen (Parallelität 1) und mit gleichzeitigen
+Aufrufen. Gemessen wird gegen den FakeFritzBox-Platzhalter aus soak_test.py,
+der jede Anfrage um die angegebene Antwortzeit verzögert. Jede Variante läuft
+in einem eigenen Thread-Pool mit so vielen Threads wie ihre Parallelität, damit
+--concurrency nicht still auf TR064_CONCURRENCY begrenzt wird.
+
+Aufruf:
+    python benchmark_tr064.py --devices 10 --latency 0.05 --concurrency 4
+"""
+import asyncio
+import logging
+import argparse
+import statistics
+import time
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+from soak_test import FakeFritzBox
+import fritzbox_collector
+from async_tr064 import TR064_CONCURRENCY
+
+logger = logging.getLogger("benchmark_tr064")
+
+
+def measure_cycle(box, concurrency, rounds):
+    """
+    Misst die Zykluszeit über mehrere Durchläufe.
+
+    Die erste Runde listet alle Geräte auf und füllt die Gerätekarte; danach
+    entspricht jeder Durchlauf einem normalen Zyklus.
+
+    Returns:
+        dict: Median- und Maximalzeit in Millisekunden sowie TR-064-Aufrufe pro Zyklus
+    """
+    fritzbox_collector._DEVICE_MAP.clear()
+    fritzbox_collector._device_map_updated = 0.0
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="benchmark") as executor:
+        cycle = partial(fritzbox_collector.get_fritz_data_async, box, concurrency=concurrency, executor=executor)
+        asyncio.run(cycle())
+
+        durations = []
+        calls_before = box.calls
+        for _ in range(rounds):
+            started = time.perf_counter()
+            asyncio.run(cycle())
+            durations.append(time.perf_counter() - started)
+    return {
+        "concurrency": concurrency,
+        "median_ms": statistics.median(durations) * 1000,
+        "max_ms": max(durations) * 1000,
+        "calls_per_cycle": (box.calls - calls_before) / rounds,
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    parser = argparse.ArgumentParser(description="Benchmark: TR-064-Aufrufe nacheinander vs. gleichzeitig")
+    parser.add_argument("--devices", type=int, default=10, help="Anzahl simulierter DECT-Geräte (Standard: 10)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Antwortzeit pro Aufruf in Sekunden (Standard: 0.05)")
+    parser.add_argument("--concurrency", type=int, default=TR064_CONCURRENCY,
+                        help="Parallelität des gleichzeitigen Laufs (Standard: TR064_CONCURRENCY)")
+    parser.add_argument("--rounds", type=int, default=5, help="Gemessene Zyklen pro Variante (Standard: 5)")
+    args = parser.parse_args()
+    if args.concurrency < 1:
+        parser.error("--concurrency muss mindestens 1 sein")
+
+    logging.getLogger("fritzbox_collector").setLevel(logging.WARNING)
+    box = FakeFritzBox(args.devices, latency=args.latency)
+    sequential = measure_cycle(box, 1, args.rounds)
+    concurrent = measure_cycle(box, args.concurrency, args.rounds)
+    for result in (sequential, concurrent):
+        logger.info(
+            "Parallelität %s: Median %.1f ms, Maximum %.1f ms, %.0f Aufrufe pro Zyklus",
+            result["concurrency"], result["median_ms"], result["max_ms"], result["calls_per_cycle"]
+        )
+    logger.info("Beschleunigung: Faktor %.2f", sequential["median_ms"] / concurrent["median_ms"])
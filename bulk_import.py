@@ -0,0 +1,380 @@
+"""
+Bulk Import Module
+
+Importiert CSV- oder JSON-Lines-Exporte (z. B. nach Migration oder aus einer
+Spool-Datei) gestreamt und in großen Blöcken in die Collector-Tabellen.
+
+Jede Zeile wird gegen das Tabellenschema geprüft, blockweise in eine temporäre
+Staging-Tabelle geladen (LOAD DATA LOCAL INFILE oder mehrzeilige INSERTs) und
+von dort nur übernommen, wenn der Schlüssel (z. B. ain + time) noch nicht
+existiert. Innerhalb eines Blocks gewinnt die erste Zeile je Schlüssel. Ein
+erneuter Import derselben Datei ist damit folgenlos.
+
+Für einen schnellen Abgleich sollte ein Index auf dem Schlüssel existieren;
+mit --create-index wird er bei Bedarf angelegt (ALTER auf der Zieltabelle).
+
+Aufruf:
+    python bulk_import.py dect200_data export.jsonl --create-index
+    python bulk_import.py weather_data export.csv --load-data --chunk-size 100000
+"""
+import os
+import re
+import csv
+import sys
+import json
+import math
+import time
+import logging
+import argparse
+import tempfile
+from datetime import datetime
+import mysql.connector
+
+logger = logging.getLogger(__name__)
+
+# SQL-Konfiguration (wird von fritzbox_collector.py übernommen)
+SQL_CONFIG = {
+    "user": os.getenv("SQL_USER", "sqluser"),
+    "password": os.getenv("SQL_PASSWORD", "sqlpass"),
+    "host": os.getenv("SQL_HOST", "sqlhost"),
+    "database": os.getenv("SQL_DB", "sqldb"),
+    "autocommit": True
+}
+
+# Spalten je Tabelle (Reihenfolge = Insert-Reihenfolge) und Dedup-Schlüssel.
+# dect200_data entspricht den Feldern aus _normalize_device_info plus time.
+TABLE_SCHEMAS = {
+    "dect200_data": {
+        "columns": {
+            "ain": str,
+            "state": int,
+            "power": int,
+            "temperature": int,
+            "product_name": str,
+            "device_name": str,
+            "multimeter_power": int,
+            "temperature_celsius": int,
+            "switch_state": str,
+            "hkr_is_temperature": int,
+            "hkr_set_ventil_status": str,
+            "hkr_set_temperature": int,
+            "multimeter_energy": int,
+            "energy_wh": int,
+            "time": datetime,
+        },
+        "key": ("ain", "time"),
+        "required": ("ain", "time"),
+    },
+    "fritzbox_status": {
+        "columns": {
+            "online": str,
+            "external_ip": str,
+            "active_devices": int,
+            "time": datetime,
+        },
+        "key": ("time",),
+        "required": ("time",),
+    },
+    "speedtest_results": {
+        "columns": {
+            "ping_ms": float,
+            "download_mbps": float,
+            "upload_mbps": float,
+            "time": datetime,
+        },
+        "key": ("time",),
+        "required": ("time",),
+    },
+    "weather_data": {
+        "columns": {
+            "location": str,
+            "temperature_celsius": float,
+            "feels_like_celsius": float,
+            "humidity": int,
+            "pressure": int,
+            "weather_condition": str,
+            "weather_description": str,
+            "wind_speed": float,
+            "clouds": int,
+            "time": datetime,
+        },
+        "key": ("location", "time"),
+        "required": ("time",),
+    },
+}
+
+_TIME_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%dT%H:%M:%S.%f")
+
+
+def _parse_time(value):
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value)
+    text = str(value).strip().rstrip("Z")
+    try:
+        # Schneller Weg für das erwartete ISO-Format (mit Leerzeichen oder T)
+        parsed = datetime.fromisoformat(text)
+        return parsed.astimezone().replace(tzinfo=None) if parsed.tzinfo else parsed
+    except ValueError:
+        pass
+    for fmt in _TIME_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"Ungültiger Zeitstempel: {value!r}")
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except ValueError:
+        # z. B. "2500.0"; int(float("inf")) wirft OverflowError
+        return int(float(value))
+
+
+def _to_float(value):
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError(f"Ungültiger Wert: {value}")
+    return value
+
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _to_ain(value):
+    # Wie _compact_ain im Collector: Leerzeichen entfernen
+    return _WHITESPACE.sub("", str(value))
+
+
+_CONVERTERS = {datetime: _parse_time, int: _to_int, float: _to_float, str: str}
+
+# Pro Tabelle vorab aufgelöst: (Spalte, Umwandlung, Pflichtfeld)
+_ROW_PLANS = {
+    table: [
+        (column, _to_ain if column == "ain" else _CONVERTERS[kind], column in schema["required"])
+        for column, kind in schema["columns"].items()
+    ]
+    for table, schema in TABLE_SCHEMAS.items()
+}
+
+
+def validate_row(table, raw):
+    """
+    Prüft eine Eingabezeile gegen das Tabellenschema und wandelt die Typen.
+
+    Args:
+        table (str): Zieltabelle
+        raw (dict): Eingabezeile (CSV oder JSON)
+
+    Returns:
+        tuple: Werte in Spaltenreihenfolge
+
+    Raises:
+        ValueError: bei fehlenden Pflichtfeldern oder nicht wandelbaren Werten
+    """
+    if not isinstance(raw, dict):
+        raise ValueError(f"Zeile ist kein Objekt: {type(raw).__name__}")
+    values = []
+    for column, convert, required in _ROW_PLANS[table]:
+        value = raw.get(column)
+        if value is None or value == "" or value == "\\N":
+            if required:
+                raise ValueError(f"Pflichtfeld fehlt: {column}")
+            values.append(None)
+            continue
+        try:
+            values.append(convert(value))
+        except (ValueError, OverflowError) as e:
+            raise ValueError(f"Ungültiger Wert für {column}: {value!r} ({e})") from None
+    return tuple(values)
+
+
+def read_rows(path):
+    """
+    Liest CSV- oder JSON-Lines-Dateien zeilenweise (Format anhand der Endung).
+
+    JSON-Zeilen werden als Text geliefert und erst in decode_row geparst, damit eine
+    fehlerhafte Zeile als ungültig gezählt wird statt den Import abzubrechen.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".json", ".ndjson")):
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield line
+        else:
+            yield from csv.DictReader(f)
+
+
+def decode_row(raw):
+    """Parst eine JSON-Zeile aus read_rows; CSV-Zeilen sind bereits Dicts."""
+    return json.loads(raw) if isinstance(raw, str) else raw
+
+
+def _tsv_value(value):
+    if value is None:
+        return "\\N"
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+def _prepare_staging(cursor, table):
+    cursor.execute(f"CREATE TEMPORARY TABLE IF NOT EXISTS {table}_import LIKE {table}")
+    cursor.execute(f"TRUNCATE TABLE {table}_import")
+
+
+def _ensure_key_index(cursor, table, create=False):
+    """
+    Prüft, ob ein Index auf dem Dedup-Schlüssel existiert, und legt ihn nur mit create=True an.
+
+    Ohne Index muss der Abgleich je Block die ganze Zieltabelle durchsuchen.
+    """
+    key = TABLE_SCHEMAS[table]["key"]
+    index_name = "idx_import_" + "_".join(key)
+    cursor.execute(
+        """
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND COLUMN_NAME = %s AND SEQ_IN_INDEX = 1
+        """,
+        (SQL_CONFIG["database"], table, key[0])
+    )
+    if cursor.fetchone()[0] > 0:
+        return
+    if not create:
+        logger.warning(
+            "Kein Index auf %s(%s) – der Duplikatabgleich kann langsam sein. "
+            "Mit --create-index wird %s angelegt.", table, ", ".join(key), index_name
+        )
+        return
+    cursor.execute(f"CREATE INDEX {index_name} ON {table} ({', '.join(key)})")
+    logger.info("Index %s auf %s angelegt.", index_name, table)
+
+
+def _dedup_chunk(table, rows):
+    """Behält je Dedup-Schlüssel nur die erste Zeile eines Blocks."""
+    columns = list(TABLE_SCHEMAS[table]["columns"])
+    positions = [columns.index(k) for k in TABLE_SCHEMAS[table]["key"]]
+    unique = {}
+    for row in rows:
+        unique.setdefault(tuple(row[p] for p in positions), row)
+    return list(unique.values())
+
+
+def _load_chunk(cursor, table, rows, use_load_data):
+    rows = _dedup_chunk(table, rows)
+    columns = list(TABLE_SCHEMAS[table]["columns"])
+    column_list = ", ".join(columns)
+    if use_load_data:
+        with tempfile.NamedTemporaryFile("w", suffix=".tsv", delete=False, encoding="utf-8") as tmp:
+            for row in rows:
+                tmp.write("\t".join(_tsv_value(v) for v in row))
+                tmp.write("\n")
+        try:
+            cursor.execute(
+                f"LOAD DATA LOCAL INFILE %s INTO TABLE {table}_import "
+                f"FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' ({column_list})",
+                (tmp.name,)
+            )
+        finally:
+            os.unlink(tmp.name)
+    else:
+        placeholders = ", ".join(["%s"] * len(columns))
+        # executemany fasst INSERT ... VALUES automatisch zu mehrzeiligen Statements zusammen
+        cursor.executemany(
+            f"INSERT INTO {table}_import ({column_list}) VALUES ({placeholders})",
+            rows
+        )
+
+    key_match = " AND ".join(f"t.{k} <=> s.{k}" for k in TABLE_SCHEMAS[table]["key"])
+    cursor.execute(
+        f"""
+        INSERT INTO {table} ({column_list})
+        SELECT {", ".join(f"s.{c}" for c in columns)}
+        FROM {table}_import s
+        WHERE NOT EXISTS (SELECT 1 FROM {table} t WHERE {key_match})
+        """
+    )
+    inserted = cursor.rowcount
+    cursor.execute(f"TRUNCATE TABLE {table}_import")
+    return inserted
+
+
+def bulk_import(table, path, chunk_size=50_000, use_load_data=False, create_index=False):
+    """
+    Importiert eine Exportdatei blockweise und idempotent in die Zieltabelle.
+
+    Args:
+        table (str): Zieltabelle (siehe TABLE_SCHEMAS)
+        path (str): Pfad zur CSV- oder JSON-Lines-Datei
+        chunk_size (int): Zeilen pro Block
+        use_load_data (bool): LOAD DATA LOCAL INFILE statt mehrzeiliger INSERTs verwenden
+        create_index (bool): Fehlenden Index auf dem Dedup-Schlüssel in der Zieltabelle anlegen
+
+    Returns:
+        dict: read, invalid, inserted, seconds
+    """
+    if table not in TABLE_SCHEMAS:
+        raise ValueError(f"Tabelle nicht unterstützt: {table}")
+
+    config = dict(SQL_CONFIG)
+    if use_load_data:
+        config["allow_local_infile"] = True
+    conn = mysql.connector.connect(**config)
+    cursor = conn.cursor()
+    _ensure_key_index(cursor, table, create_index)
+    _prepare_staging(cursor, table)
+
+    stats = {"read": 0, "invalid": 0, "inserted": 0}
+    started = time.monotonic()
+    chunk = []
+    try:
+        for line_no, raw in enumerate(read_rows(path), start=1):
+            stats["read"] += 1
+            try:
+                chunk.append(validate_row(table, decode_row(raw)))
+            except (ValueError, TypeError, OverflowError) as e:
+                stats["invalid"] += 1
+                if stats["invalid"] <= 10:
+                    logger.warning("Zeile %s übersprungen: %s", line_no, e)
+                continue
+            if len(chunk) >= chunk_size:
+                stats["inserted"] += _load_chunk(cursor, table, chunk, use_load_data)
+                chunk = []
+                elapsed = time.monotonic() - started
+                logger.info(
+                    "%s: %s Zeilen gelesen, %s neu, %.0f Zeilen/s",
+                    table, stats["read"], stats["inserted"], stats["read"] / elapsed if elapsed else 0
+                )
+        if chunk:
+            stats["inserted"] += _load_chunk(cursor, table, chunk, use_load_data)
+    finally:
+        cursor.close()
+        conn.close()
+
+    stats["seconds"] = time.monotonic() - started
+    logger.info(
+        "Import %s abgeschlossen: %s gelesen, %s ungültig, %s neu, %s Duplikate, %.1f s (%.0f Zeilen/s)",
+        table, stats["read"], stats["invalid"], stats["inserted"],
+        stats["read"] - stats["invalid"] - stats["inserted"], stats["seconds"],
+        stats["read"] / stats["seconds"] if stats["seconds"] else 0
+    )
+    return stats
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    parser = argparse.ArgumentParser(description="Bulk-Import von CSV/JSON-Lines-Exporten in die Collector-Tabellen")
+    parser.add_argument("table", choices=sorted(TABLE_SCHEMAS))
+    parser.add_argument("path", help="CSV- oder JSON-Lines-Datei (.jsonl/.ndjson/.json)")
+    parser.add_argument("--chunk-size", type=int, default=50_000, help="Zeilen pro Block (Standard: 50000)")
+    parser.add_argument("--load-data", action="store_true", help="LOAD DATA LOCAL INFILE verwenden (local_infile muss am Server aktiv sein)")
+    parser.add_argument("--create-index", action="store_true",
+                        help="Fehlenden Index auf dem Dedup-Schlüssel (z. B. ain, time) in der Zieltabelle anlegen")
+    args = parser.parse_args()
+    try:
+        bulk_import(args.table, args.path, args.chunk_size, args.load_data, args.create_index)
+    except Exception as e:
+        logger.error("Import fehlgeschlagen: %s", e)
+        sys.exit(1)
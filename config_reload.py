@@ -0,0 +1,219 @@
+"""
+Config Reload Module
+
+Lädt ausgewählte Einstellungen zur Laufzeit neu, ohne den Container neu zu
+starten. Quelle ist eine Datei im Format KEY=VALUE (gleiche Namen wie die
+Umgebungsvariablen, # leitet Kommentare ein), standardmäßig
+/config/fritzbox_collector.conf. Neu geladen wird, sobald sich die Datei
+ändert oder der Prozess SIGHUP erhält.
+
+Die Datei wird vollständig geprüft, bevor irgendetwas übernommen wird: Ist ein
+Wert ungültig, bleibt die bisherige Konfiguration unverändert. Fehlt ein
+Schlüssel in der Datei, gilt wieder der Wert aus der Umgebung.
+
+Übernommen werden die Änderungen von der Hauptschleife zwischen zwei Zyklen.
+Deren Wartezeit (wait) wird durch SIGHUP sofort und durch eine geänderte Datei
+spätestens nach CONFIG_POLL_INTERVAL Sekunden unterbrochen. Verbindungen,
+Gerätekarte und Statistiken bleiben erhalten.
+"""
+import os
+import time
+import queue
+import signal
+import logging
+from notify import notify_all
+
+logger = logging.getLogger(__name__)
+
+CONFIG_FILE = os.getenv("CONFIG_FILE", "/config/fritzbox_collector.conf")
+# Prüfabstand der Datei während der Wartezeit zwischen zwei Zyklen (Sekunden)
+CONFIG_POLL_INTERVAL = float(os.getenv("CONFIG_POLL_INTERVAL", "5"))
+
+
+class ConfigError(ValueError):
+    """Ungültige Konfigurationsdatei oder ungültiger Wert."""
+
+
+def _ains(value):
+    return [a.strip() for a in value.split(",") if a.strip()]
+
+
+def _positive_int(value):
+    number = int(value)
+    if number <= 0:
+        raise ValueError("muss größer als 0 sein")
+    return number
+
+
+def _price(value):
+    price = float(value)
+    if not 0 <= price < 10:
+        raise ValueError("muss zwischen 0 und 10 EUR/kWh liegen")
+    return price
+
+
+# Zur Laufzeit änderbare Einstellungen und ihre Prüfung
+RELOADABLE = {
+    "DECT_AINS": _ains,
+    "DECT_DISCOVERY_INTERVAL": _positive_int,
+    "COLLECT_INTERVAL": _positive_int,
+    "SPEEDTEST_INTERVAL": _positive_int,
+    "WEATHER_INTERVAL": _positive_int,
+    "ELECTRICITY_PRICE_EUR_PER_KWH": _price,
+}
+
+
+def read_config_file(path):
+    """
+    Liest eine KEY=VALUE-Datei.
+
+    Returns:
+        dict: Rohwerte als Strings
+
+    Raises:
+        ConfigError: bei Zeilen ohne '='
+    """
+    values = {}
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            key, sep, value = line.partition("=")
+            if not sep:
+                raise ConfigError(f"Zeile {number}: '=' fehlt")
+            values[key.strip()] = value.strip().strip("'\"")
+    return values
+
+
+def validate_config(raw):
+    """
+    Prüft alle Rohwerte und wandelt sie um.
+
+    Returns:
+        dict: Gültige, umgewandelte Werte
+
+    Raises:
+        ConfigError: mit allen gefundenen Fehlern, wenn mindestens ein Wert ungültig ist
+    """
+    values = {}
+    errors = []
+    for key, value in raw.items():
+        parser = RELOADABLE.get(key)
+        if parser is None:
+            logger.warning("%s ist nicht zur Laufzeit änderbar und wird ignoriert (Neustart nötig).", key)
+            continue
+        try:
+            values[key] = parser(value)
+        except ValueError as e:
+            errors.append(f"{key}={value!r}: {e}")
+    if errors:
+        raise ConfigError("; ".join(errors))
+    return values
+
+
+class ConfigReloader:
+    """Erkennt geänderte Konfiguration (Datei oder SIGHUP) und liefert die Unterschiede."""
+
+    def __init__(self, baseline, path=CONFIG_FILE, current=None):
+        """
+        Args:
+            baseline (dict): Werte aus der Umgebung, gelten für fehlende Schlüssel
+            path (str): Konfigurationsdatei
+            current (dict): Tatsächlich aktive Werte, falls sie von der Umgebung abweichen
+                (z. B. der Strompreis aus der Datenbank nach einem Neustart)
+        """
+        self.path = path
+        self.baseline = dict(baseline)
+        self.config = {**self.baseline, **(current or {})}
+        self._file_state = None
+        self._reload_requested = False
+        # SimpleQueue.put ist aus Signal-Handlern heraus sicher (anders als Event.set)
+        self._wakeup = queue.SimpleQueue()
+
+    def request_reload(self, *args):
+        """Signal-Handler für SIGHUP: Datei beim nächsten poll() neu laden und wait() beenden."""
+        self._reload_requested = True
+        self._wakeup.put(None)
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+            # Größe zusätzlich vergleichen, falls zwei Änderungen denselben Zeitstempel tragen
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def wait(self, timeout):
+        """
+        Wartet bis zu `timeout` Sekunden, endet aber vorzeitig bei SIGHUP oder geänderter Datei.
+
+        Returns:
+            bool: True, wenn vorzeitig geweckt wurde (poll() liefert dann die Änderungen)
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            try:
+                self._wakeup.get(timeout=min(remaining, CONFIG_POLL_INTERVAL))
+                return True
+            except queue.Empty:
+                pass
+            if self._stat() != self._file_state:
+                return True
+
+    def poll(self):
+        """
+        Lädt neu, falls sich die Datei geändert hat oder SIGHUP empfangen wurde.
+
+        Returns:
+            dict: Geänderte Einstellungen (leer, wenn nichts zu übernehmen ist)
+        """
+        # Bereits durch wait() oder poll() verarbeitete Weckrufe verwerfen
+        while not self._wakeup.empty():
+            self._wakeup.get_nowait()
+        file_state = self._stat()
+        if file_state == self._file_state and not self._reload_requested:
+            return {}
+        self._reload_requested = False
+        self._file_state = file_state
+        return self.reload(exists=file_state is not None)
+
+    def reload(self, exists=True):
+        """Prüft die Datei vollständig und übernimmt sie nur, wenn alle Werte gültig sind."""
+        try:
+            values = validate_config(read_config_file(self.path)) if exists else {}
+        except (OSError, ConfigError) as e:
+            logger.error("Konfiguration %s nicht übernommen: %s", self.path, e)
+            notify_all(f"Konfiguration nicht übernommen: {e}")
+            return {}
+        new_config = {**self.baseline, **values}
+        changes = {key: value for key, value in new_config.items() if self.config.get(key) != value}
+        self.config = new_config
+        if changes:
+            logger.info(
+                "Konfiguration neu geladen: %s",
+                ", ".join(f"{key}={value}" for key, value in sorted(changes.items()))
+            )
+        return changes
+
+
+def start_config_reloader(baseline, current=None):
+    """
+    Erzeugt den Reloader und registriert SIGHUP.
+
+    Args:
+        baseline (dict): Aktuelle Werte aus der Umgebung, gelten für fehlende Schlüssel
+        current (dict): Davon abweichend bereits aktive Werte (siehe ConfigReloader)
+    """
+    reloader = ConfigReloader(baseline, current=current)
+    if hasattr(signal, "SIGHUP"):
+        try:
+            signal.signal(signal.SIGHUP, reloader.request_reload)
+        except ValueError:
+            # signal.signal ist nur im Haupt-Thread erlaubt
+            logger.warning("SIGHUP-Handler konnte nicht registriert werden – nur Dateiänderungen werden erkannt.")
+    logger.info("Konfigurationsdatei %s wird auf Änderungen überwacht (oder SIGHUP).", reloader.path)
+    return reloader
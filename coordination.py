@@ -0,0 +1,207 @@
+"""
+Coordination Module
+
+Verteilt Sammelaufgaben (FritzBox, Speedtest, Wetter, Retention) auf mehrere Collector-
+Replikas, ohne dass zwei Replikas dieselbe Aufgabe bearbeiten.
+
+Jede Replika meldet sich per Heartbeat in collector_replicas und hält für ihre
+Aufgaben Leases in collector_leases. Welche Replika eine Aufgabe übernehmen
+soll, bestimmt ein Consistent-Hashing-Ring über alle lebenden Replikas; kommt
+eine Replika hinzu oder fällt eine aus, wandern nur wenige Aufgaben. Eine Lease
+wird nur übernommen, wenn sie frei, abgelaufen oder bereits die eigene ist.
+Alle Zeitvergleiche nutzen die Uhr der Datenbank.
+"""
+import os
+import time
+import socket
+import bisect
+import hashlib
+import logging
+import threading
+import mysql.connector
+from notify import notify_all
+
+logger = logging.getLogger(__name__)
+
+COLLECTOR_SHARDING = os.getenv("COLLECTOR_SHARDING", "0").lower() in ("1", "true", "yes")
+REPLICA_ID = os.getenv("REPLICA_ID", "") or f"{socket.gethostname()}-{os.getpid()}"
+LEASE_TTL = int(os.getenv("LEASE_TTL", "90"))
+LEASE_HEARTBEAT_INTERVAL = int(os.getenv("LEASE_HEARTBEAT_INTERVAL", "30"))
+
+# Virtuelle Knoten pro Replika für eine gleichmäßige Verteilung auf dem Ring
+RING_VNODES = 64
+
+# SQL-Konfiguration (wird von fritzbox_collector.py übernommen)
+SQL_CONFIG = {
+    "user": os.getenv("SQL_USER", "sqluser"),
+    "password": os.getenv("SQL_PASSWORD", "sqlpass"),
+    "host": os.getenv("SQL_HOST", "sqlhost"),
+    "database": os.getenv("SQL_DB", "sqldb"),
+    "autocommit": True
+}
+
+
+def create_lease_tables():
+    """Erstellt die Tabellen für Replikas und Leases, falls sie nicht existieren."""
+    logger.info("Prüfe und erstelle ggf. collector_replicas/collector_leases Tabellen...")
+    table_sql = [
+        """CREATE TABLE IF NOT EXISTS collector_replicas (
+            replica_id VARCHAR(128) PRIMARY KEY,
+            last_seen DATETIME
+        )""",
+        """CREATE TABLE IF NOT EXISTS collector_leases (
+            target VARCHAR(128) PRIMARY KEY,
+            owner VARCHAR(128),
+            expires_at DATETIME,
+            time DATETIME
+        )"""
+    ]
+    try:
+        conn = mysql.connector.connect(**SQL_CONFIG)
+        cursor = conn.cursor()
+        for sql in table_sql:
+            cursor.execute(sql)
+        cursor.close()
+        conn.close()
+        logger.info("Lease-Tabellen wurden geprüft/erstellt.")
+    except Exception as e:
+        logger.error("Fehler bei Lease-Tabellenprüfung/-erstellung: %s", e)
+        notify_all(f"Lease-Tabellen konnten nicht angelegt werden: {e}")
+        raise
+
+
+def _hash(value):
+    return int(hashlib.md5(value.encode("utf-8")).hexdigest()[:16], 16)
+
+
+class HashRing:
+    """Consistent-Hashing-Ring über die IDs der lebenden Replikas."""
+
+    def __init__(self, replicas, vnodes=RING_VNODES):
+        self._points = sorted(
+            (_hash(f"{replica}#{i}"), replica) for replica in replicas for i in range(vnodes)
+        )
+        self._keys = [point for point, _ in self._points]
+
+    def owner(self, target):
+        """Replika, die für `target` zuständig ist (None bei leerem Ring)."""
+        if not self._points:
+            return None
+        index = bisect.bisect(self._keys, _hash(target)) % len(self._points)
+        return self._points[index][1]
+
+
+class LeaseCoordinator:
+    """Hält per Heartbeat die Leases der eigenen Aufgaben und gibt fremde zurück."""
+
+    def __init__(self, targets, replica_id=REPLICA_ID, ttl=LEASE_TTL):
+        self.targets = list(targets)
+        self.replica_id = replica_id
+        self.ttl = ttl
+        self.owned = set()
+        # Bis zum ersten erfolgreichen Heartbeat wird nichts bearbeitet
+        self._valid_until = 0.0
+        self._lock = threading.Lock()
+
+    def owns(self, target):
+        """True, solange die Lease für `target` gehalten wird und nicht lokal abgelaufen ist."""
+        with self._lock:
+            return target in self.owned and time.monotonic() < self._valid_until
+
+    def heartbeat(self):
+        """Meldet die Replika als lebendig, verteilt die Aufgaben neu und erneuert/übernimmt Leases."""
+        started = time.monotonic()
+        conn = mysql.connector.connect(**SQL_CONFIG)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                INSERT INTO collector_replicas (replica_id, last_seen) VALUES (%s, NOW())
+                ON DUPLICATE KEY UPDATE last_seen = NOW()
+                """,
+                (self.replica_id,)
+            )
+            cursor.execute(
+                "SELECT replica_id FROM collector_replicas WHERE last_seen >= NOW() - INTERVAL %s SECOND",
+                (self.ttl,)
+            )
+            ring = HashRing([row[0] for row in cursor.fetchall()])
+
+            owned = set()
+            for target in self.targets:
+                if ring.owner(target) == self.replica_id:
+                    if self._claim(cursor, target):
+                        owned.add(target)
+                else:
+                    # Aufgabe gehört laut Ring einer anderen Replika - eigene Lease freigeben
+                    self._release(cursor, target)
+            # Replikas, die seit langem keinen Heartbeat mehr senden, entfernen
+            cursor.execute(
+                "DELETE FROM collector_replicas WHERE last_seen < NOW() - INTERVAL %s SECOND",
+                (self.ttl * 10,)
+            )
+            cursor.close()
+        finally:
+            conn.close()
+
+        with self._lock:
+            if owned != self.owned:
+                logger.info("Replika %s bearbeitet jetzt: %s", self.replica_id, ", ".join(sorted(owned)) or "-")
+            self.owned = owned
+            # Lokale Gültigkeit etwas kürzer als die Lease, damit nie zwei Replikas gleichzeitig arbeiten
+            self._valid_until = started + self.ttl * 0.8
+        return owned
+
+    def _claim(self, cursor, target):
+        cursor.execute(
+            """
+            INSERT INTO collector_leases (target, owner, expires_at, time)
+            VALUES (%s, %s, NOW() + INTERVAL %s SECOND, NOW())
+            ON DUPLICATE KEY UPDATE
+                owner = IF(owner = VALUES(owner) OR expires_at < NOW(), VALUES(owner), owner),
+                expires_at = IF(owner = VALUES(owner), VALUES(expires_at), expires_at),
+                time = NOW()
+            """,
+            (target, self.replica_id, self.ttl)
+        )
+        cursor.execute("SELECT owner FROM collector_leases WHERE target = %s", (target,))
+        row = cursor.fetchone()
+        return bool(row) and row[0] == self.replica_id
+
+    def _release(self, cursor, target):
+        cursor.execute(
+            """
+            UPDATE collector_leases SET expires_at = NOW() - INTERVAL 1 SECOND, time = NOW()
+            WHERE target = %s AND owner = %s AND expires_at >= NOW()
+            """,
+            (target, self.replica_id)
+        )
+
+
+def _heartbeat_loop(coordinator):
+    while True:
+        time.sleep(LEASE_HEARTBEAT_INTERVAL)
+        try:
+            coordinator.heartbeat()
+        except Exception as e:
+            logger.error("Lease-Heartbeat fehlgeschlagen: %s", e)
+
+
+def start_coordinator(targets):
+    """
+    Startet den Lease-Heartbeat im Hintergrund, sofern COLLECTOR_SHARDING aktiv ist.
+
+    Returns:
+        LeaseCoordinator oder None (ohne Sharding bearbeitet die Replika alles)
+    """
+    if not COLLECTOR_SHARDING:
+        return None
+    coordinator = LeaseCoordinator(targets)
+    try:
+        coordinator.heartbeat()
+    except Exception as e:
+        logger.error("Erster Lease-Heartbeat fehlgeschlagen: %s", e)
+    thread = threading.Thread(target=_heartbeat_loop, args=(coordinator,), name="lease-heartbeat", daemon=True)
+    thread.start()
+    logger.info("Sharding aktiv: Replika %s, Lease-TTL %s s.", coordinator.replica_id, LEASE_TTL)
+    return coordinator
@@ -37,6 +37,32 @@ CREATE TABLE weather_data (
     time DATETIME
 );
 
+CREATE TABLE wan_traffic (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    interval_start DATETIME,
+    duration_s INT,
+    bytes_down BIGINT,
+    bytes_up BIGINT,
+    avg_down_rate FLOAT,
+    avg_up_rate FLOAT,
+    peak_down_rate FLOAT,
+    peak_up_rate FLOAT,
+    samples INT,
+    counter_resets INT,
+    time DATETIME
+);
+
+CREATE TABLE wan_outages (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    start_time DATETIME(3),
+    end_time DATETIME(3),
+    duration_s FLOAT,
+    status VARCHAR(32),
+    old_external_ip VARCHAR(64),
+    new_external_ip VARCHAR(64),
+    time DATETIME
+);
+
 CREATE TABLE electricity_price_config (
     id INT AUTO_INCREMENT PRIMARY KEY,
     price_eur_per_kwh FLOAT NOT NULL,
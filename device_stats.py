@@ -0,0 +1,294 @@
+"""
+Device Statistics Module
+
+Führt pro AIN laufende Statistiken direkt bei der Erfassung: Mittelwert und
+Varianz der Leistung (Welford), einen gleitenden Mittelwert (EWMA) und eine
+Grundlinie pro Tagesstunde. Der Speicherbedarf ist pro Gerät konstant, jeder
+Messwert kostet O(1).
+
+Daraus werden Anomalien erkannt, z. B. ein Gerät, das plötzlich ein Vielfaches
+seiner üblichen Leistung zieht, oder ein Thermostat, dessen Ist-Temperatur
+dauerhaft von der Solltemperatur abweicht. Anomalien landen in der Tabelle
+device_anomalies und werden über notify_all gemeldet. Der Zustand wird
+regelmäßig in device_stats_state gesichert und beim Start wieder geladen.
+"""
+import os
+import json
+import time
+import logging
+import mysql.connector
+from notify import notify_all
+
+logger = logging.getLogger(__name__)
+
+DEVICE_STATS_ENABLED = os.getenv("DEVICE_STATS_ENABLED", "0").lower() in ("1", "true", "yes")
+DEVICE_STATS_PERSIST_INTERVAL = int(os.getenv("DEVICE_STATS_PERSIST_INTERVAL", "900"))
+# Leistungsspitze: Faktor gegenüber der Grundlinie und Mindest-z-Wert
+ANOMALY_POWER_FACTOR = float(os.getenv("ANOMALY_POWER_FACTOR", "2.0"))
+ANOMALY_POWER_ZSCORE = float(os.getenv("ANOMALY_POWER_ZSCORE", "3.0"))
+# Unterhalb dieser Leistung (mW) werden keine Spitzen gemeldet
+ANOMALY_POWER_MIN_MW = int(os.getenv("ANOMALY_POWER_MIN_MW", "10000"))
+# Thermostat: Abweichung Ist/Soll (0,1 °C) über wie viele aufeinanderfolgende Messungen
+ANOMALY_HKR_DRIFT = int(os.getenv("ANOMALY_HKR_DRIFT", "20"))
+ANOMALY_HKR_SAMPLES = int(os.getenv("ANOMALY_HKR_SAMPLES", "6"))
+# Mindestanzahl Messwerte, bevor eine Grundlinie als belastbar gilt
+MIN_BASELINE_SAMPLES = 30
+# Untergrenze der Standardabweichung (mW), damit konstante Verbraucher einen endlichen z-Wert erhalten
+MIN_POWER_STDDEV_MW = 1000.0
+EWMA_ALPHA = 0.1
+
+# SQL-Konfiguration (wird von fritzbox_collector.py übernommen)
+SQL_CONFIG = {
+    "user": os.getenv("SQL_USER", "sqluser"),
+    "password": os.getenv("SQL_PASSWORD", "sqlpass"),
+    "host": os.getenv("SQL_HOST", "sqlhost"),
+    "database": os.getenv("SQL_DB", "sqldb"),
+    "autocommit": True
+}
+
+
+def create_device_stats_tables():
+    """Erstellt die Tabellen für Statistik-Zustand und Anomalien, falls sie nicht existieren."""
+    logger.info("Prüfe und erstelle ggf. device_stats_state/device_anomalies Tabellen...")
+    table_sql = [
+        """CREATE TABLE IF NOT EXISTS device_stats_state (
+            ain VARCHAR(32) PRIMARY KEY,
+            state TEXT,
+            time DATETIME
+        )""",
+        """CREATE TABLE IF NOT EXISTS device_anomalies (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            ain VARCHAR(32),
+            device_name VARCHAR(128),
+            anomaly_type VARCHAR(32),
+            value FLOAT,
+            baseline FLOAT,
+            zscore FLOAT,
+            message VARCHAR(255),
+            time DATETIME
+        )"""
+    ]
+    try:
+        conn = mysql.connector.connect(**SQL_CONFIG)
+        cursor = conn.cursor()
+        for sql in table_sql:
+            cursor.execute(sql)
+        cursor.close()
+        conn.close()
+        logger.info("Statistik-Tabellen wurden geprüft/erstellt.")
+    except Exception as e:
+        logger.error("Fehler bei Statistik-Tabellenprüfung/-erstellung: %s", e)
+        notify_all(f"Statistik-Tabellen konnten nicht angelegt werden: {e}")
+        raise
+
+
+class RunningStats:
+    """Welford-Mittelwert/-Varianz mit konstantem Speicher."""
+
+    __slots__ = ("count", "mean", "m2")
+
+    def __init__(self, count=0, mean=0.0, m2=0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def stddev(self):
+        return (self.m2 / (self.count - 1)) ** 0.5 if self.count > 1 else 0.0
+
+    def to_list(self):
+        return [self.count, self.mean, self.m2]
+
+
+class DeviceStatistics:
+    """Laufende Statistik eines Geräts inklusive Grundlinie pro Tagesstunde."""
+
+    def __init__(self, data=None):
+        data = data or {}
+        self.power = RunningStats(*data.get("power", []))
+        self.hourly = [RunningStats(*h) for h in data.get("hourly", [[]] * 24)]
+        self.ewma = data.get("ewma")
+        self.drift_samples = data.get("drift_samples", 0)
+        # Aktive Anomalien werden erst nach Normalisierung erneut gemeldet
+        self.active = set(data.get("active", []))
+
+    def to_dict(self):
+        return {
+            "power": self.power.to_list(),
+            "hourly": [h.to_list() for h in self.hourly],
+            "ewma": self.ewma,
+            "drift_samples": self.drift_samples,
+            "active": sorted(self.active),
+        }
+
+
+def _as_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class DeviceStatsEngine:
+    """Verarbeitet normalisierte Gerätedaten und erkennt Anomalien."""
+
+    def __init__(self):
+        self.devices = {}
+        self.last_persist = time.time()
+
+    def observe(self, device, now=None):
+        """
+        Aktualisiert die Statistik eines Geräts und liefert erkannte Anomalien.
+
+        Args:
+            device (dict): Ergebnis von _normalize_device_info
+            now (float): Zeitpunkt der Messung (time.time())
+
+        Returns:
+            list: Anomalie-Dicts (ain, device_name, anomaly_type, value, baseline, zscore, message)
+        """
+        now = now or time.time()
+        ain = device["ain"]
+        stats = self.devices.get(ain)
+        if stats is None:
+            stats = self.devices[ain] = DeviceStatistics()
+        anomalies = []
+
+        power = _as_number(device.get("multimeter_power"))
+        if power is not None:
+            hour = stats.hourly[time.localtime(now).tm_hour]
+            # Grundlinie der Tagesstunde bevorzugen, sonst Gesamtstatistik
+            baseline = hour if hour.count >= MIN_BASELINE_SAMPLES else stats.power
+            if baseline.count >= MIN_BASELINE_SAMPLES:
+                zscore = (power - baseline.mean) / max(baseline.stddev, MIN_POWER_STDDEV_MW)
+                spike = (
+                    power >= ANOMALY_POWER_MIN_MW
+                    and power > baseline.mean * ANOMALY_POWER_FACTOR
+                    and zscore > ANOMALY_POWER_ZSCORE
+                )
+                if spike and "power_spike" not in stats.active:
+                    stats.active.add("power_spike")
+                    anomalies.append(self._event(
+                        device, "power_spike", power, baseline.mean, zscore,
+                        f"Leistung {power / 1000:.1f} W statt üblich {baseline.mean / 1000:.1f} W"
+                    ))
+                elif not spike:
+                    stats.active.discard("power_spike")
+            stats.power.add(power)
+            hour.add(power)
+            stats.ewma = power if stats.ewma is None else stats.ewma + EWMA_ALPHA * (power - stats.ewma)
+
+        is_temp = _as_number(device.get("hkr_is_temperature"))
+        set_temp = _as_number(device.get("hkr_set_temperature"))
+        if is_temp is not None and set_temp is not None:
+            drift = is_temp - set_temp
+            stats.drift_samples = stats.drift_samples + 1 if abs(drift) >= ANOMALY_HKR_DRIFT else 0
+            if stats.drift_samples >= ANOMALY_HKR_SAMPLES and "hkr_drift" not in stats.active:
+                stats.active.add("hkr_drift")
+                anomalies.append(self._event(
+                    device, "hkr_drift", is_temp, set_temp, None,
+                    f"Ist-Temperatur {is_temp / 10:.1f} °C weicht von Soll {set_temp / 10:.1f} °C ab"
+                ))
+            elif stats.drift_samples == 0:
+                stats.active.discard("hkr_drift")
+        return anomalies
+
+    @staticmethod
+    def _event(device, anomaly_type, value, baseline, zscore, message):
+        return {
+            "ain": device["ain"],
+            "device_name": device.get("device_name"),
+            "anomaly_type": anomaly_type,
+            "value": value,
+            "baseline": baseline,
+            "zscore": zscore,
+            "message": message,
+        }
+
+    def process(self, devices, now=None):
+        """Verarbeitet alle Geräte eines Zyklus, meldet Anomalien und sichert den Zustand periodisch."""
+        now = now or time.time()
+        anomalies = []
+        for device in devices:
+            if device.get("ain"):
+                anomalies.extend(self.observe(device, now))
+        if anomalies:
+            write_anomalies_to_sql(anomalies)
+            for anomaly in anomalies:
+                logger.warning("Anomalie %s bei %s: %s", anomaly["anomaly_type"], anomaly["ain"], anomaly["message"])
+                notify_all(f"Anomalie bei {anomaly['device_name'] or anomaly['ain']}: {anomaly['message']}")
+        if now - self.last_persist >= DEVICE_STATS_PERSIST_INTERVAL:
+            self.persist()
+            self.last_persist = now
+        return anomalies
+
+    def load(self):
+        """Lädt den gesicherten Zustand aus device_stats_state."""
+        try:
+            conn = mysql.connector.connect(**SQL_CONFIG)
+            cursor = conn.cursor()
+            cursor.execute("SELECT ain, state FROM device_stats_state")
+            for ain, state in cursor.fetchall():
+                self.devices[ain] = DeviceStatistics(json.loads(state))
+            cursor.close()
+            conn.close()
+            logger.info("Gerätestatistik für %s Gerät(e) geladen.", len(self.devices))
+        except Exception as e:
+            logger.error("Fehler beim Laden der Gerätestatistik: %s", e)
+
+    def persist(self):
+        """Sichert den Zustand aller Geräte in device_stats_state."""
+        if not self.devices:
+            return
+        try:
+            conn = mysql.connector.connect(**SQL_CONFIG)
+            cursor = conn.cursor()
+            cursor.executemany(
+                """
+                INSERT INTO device_stats_state (ain, state, time) VALUES (%s, %s, NOW())
+                ON DUPLICATE KEY UPDATE state = VALUES(state), time = NOW()
+                """,
+                [(ain, json.dumps(stats.to_dict())) for ain, stats in self.devices.items()]
+            )
+            cursor.close()
+            conn.close()
+            logger.info("Gerätestatistik für %s Gerät(e) gesichert.", len(self.devices))
+        except Exception as e:
+            logger.error("Fehler beim Sichern der Gerätestatistik: %s", e)
+
+
+def write_anomalies_to_sql(anomalies):
+    """Schreibt erkannte Anomalien in die Tabelle device_anomalies."""
+    try:
+        conn = mysql.connector.connect(**SQL_CONFIG)
+        cursor = conn.cursor()
+        cursor.executemany(
+            """
+            INSERT INTO device_anomalies (ain, device_name, anomaly_type, value, baseline, zscore, message, time)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, NOW())
+            """,
+            [
+                (a["ain"], a["device_name"], a["anomaly_type"], a["value"], a["baseline"], a["zscore"], a["message"])
+                for a in anomalies
+            ]
+        )
+        cursor.close()
+        conn.close()
+    except Exception as e:
+        logger.error("Fehler beim Schreiben der Anomalien: %s", e)
+        notify_all(f"Fehler beim Schreiben der Anomalien: {e}")
+
+
+def start_device_stats():
+    """Erzeugt die Statistik-Engine und lädt den gesicherten Zustand, sofern aktiviert."""
+    if not DEVICE_STATS_ENABLED:
+        return None
+    engine = DeviceStatsEngine()
+    engine.load()
+    return engine
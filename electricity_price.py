@@ -13,6 +13,9 @@ logger = logging.getLogger(__name__)
 # Strompreis-Konstante: 30 Eurocent pro kWh = 0.30 EUR/kWh
 ELECTRICITY_PRICE_EUR_PER_KWH = float(os.getenv("ELECTRICITY_PRICE_EUR_PER_KWH", "0.30"))
 
+# Maximale Leistung eines Zwischensteckers (FRITZ!DECT 200: 16 A bei 230 V) für die Plausibilitätsprüfung
+MAX_DEVICE_POWER_W = float(os.getenv("MAX_DEVICE_POWER_W", "3680"))
+
 # SQL-Konfiguration (wird von fritzbox_collector.py übernommen)
 SQL_CONFIG = {
     "user": os.getenv("SQL_USER", "sqluser"),
@@ -87,6 +90,47 @@ def store_electricity_price():
         notify_all(f"Fehler beim Speichern des Strompreises: {e}")
 
 
+def update_electricity_price(price):
+    """
+    Übernimmt einen neuen Strompreis zur Laufzeit: der aktive Eintrag wird beendet
+    und ein neuer ab jetzt gültiger Eintrag angelegt. Entspricht der Preis bereits
+    dem aktiven Eintrag, bleibt die Tabelle unverändert.
+    """
+    global ELECTRICITY_PRICE_EUR_PER_KWH
+    ELECTRICITY_PRICE_EUR_PER_KWH = price
+    try:
+        conn = mysql.connector.connect(**SQL_CONFIG)
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT price_eur_per_kwh
+            FROM electricity_price_config
+            WHERE valid_to IS NULL OR valid_to > NOW()
+            ORDER BY valid_from DESC
+            LIMIT 1
+        """)
+        active = cursor.fetchone()
+        if active and abs(float(active[0]) - price) < 1e-9:
+            cursor.close()
+            conn.close()
+            logger.info("Strompreis %s EUR/kWh ist bereits aktiv.", price)
+            return
+        cursor.execute("UPDATE electricity_price_config SET valid_to = NOW() WHERE valid_to IS NULL OR valid_to > NOW()")
+        cursor.execute(
+            """
+            INSERT INTO electricity_price_config
+            (price_eur_per_kwh, valid_from, valid_to, description, time)
+            VALUES (%s, NOW(), NULL, %s, NOW())
+            """,
+            (price, "Strompreis aus neu geladener Konfiguration")
+        )
+        cursor.close()
+        conn.close()
+        logger.info("Strompreis auf %s EUR/kWh geändert.", price)
+    except Exception as e:
+        logger.error("Fehler beim Ändern des Strompreises: %s", e)
+        notify_all(f"Fehler beim Ändern des Strompreises: {e}")
+
+
 def get_current_electricity_price():
     """
     Liest den aktuell gültigen Strompreis aus der Datenbank.
@@ -160,3 +204,71 @@ def calculate_power_cost_per_interval(power_mw, interval_seconds=300):
         float: Kosten in EUR für das Intervall
     """
     return calculate_energy_cost(power_mw, interval_seconds)
+
+
+def calculate_energy_cost_wh(energy_wh, price=None):
+    """
+    Berechnet die Energiekosten aus einem gemessenen Verbrauch.
+
+    Args:
+        energy_wh (int): Verbrauch in Wattstunden (Wh), z. B. Differenz zweier Zählerstände
+        price (float): Strompreis in EUR/kWh (Standard: aktuell gültiger Preis)
+
+    Returns:
+        float: Kosten in EUR
+    """
+    if energy_wh is None:
+        return 0.0
+    if price is None:
+        price = get_current_electricity_price()
+    return energy_wh / 1000 * price
+
+
+class EnergyCounterTracker:
+    """
+    Berechnet den Verbrauch pro Intervall aus den kumulativen Energiezählern
+    (NewMultimeterEnergy, Wh) der DECT-Geräte.
+
+    Die Zählerstände werden pro AIN im Speicher gehalten. Der erste Messwert eines
+    Geräts (auch nach einem Neustart des Collectors) legt nur die Basis fest.
+    """
+
+    def __init__(self, max_power_w=MAX_DEVICE_POWER_W):
+        self.max_power_w = max_power_w
+        self.counters = {}
+
+    def update(self, ain, counter_wh, now):
+        """
+        Übernimmt einen Zählerstand und liefert den Verbrauch seit dem letzten Messwert.
+
+        Ein kleinerer Zählerstand gilt als Reset (z. B. Energiezähler in der FritzBox
+        zurückgesetzt), der neue Stand wird dann als Verbrauch seit dem Reset gezählt.
+        Ein Verbrauch, der bei MAX_DEVICE_POWER_W in der vergangenen Zeit nicht möglich
+        ist (auch nach einem Reset), gilt als Gerätetausch und setzt nur eine neue Basis.
+
+        Returns:
+            int: Verbrauch in Wh oder None, wenn keine Differenz bestimmbar ist
+        """
+        if not ain or counter_wh is None:
+            return None
+        previous = self.counters.get(ain)
+        self.counters[ain] = (counter_wh, now)
+        if previous is None:
+            return None
+        previous_wh, previous_time = previous
+        if counter_wh < previous_wh:
+            logger.info("Energiezähler von %s zurückgesetzt (%s -> %s Wh).", ain, previous_wh, counter_wh)
+            delta = counter_wh
+        else:
+            delta = counter_wh - previous_wh
+        # Eine Wattstunde Toleranz für die Rundung des Zählers
+        if delta > self.max_power_w * max(now - previous_time, 0) / 3600 + 1:
+            logger.warning(
+                "Unplausibler Sprung des Energiezählers von %s (%s -> %s Wh) – Gerät getauscht?",
+                ain, previous_wh, counter_wh
+            )
+            return None
+        return delta
+
+    def forget(self, ain):
+        self.counters.pop(ain, None)
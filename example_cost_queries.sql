@@ -9,13 +9,16 @@ ORDER BY valid_from DESC
 LIMIT 1;
 
 -- 2. Stromkosten für DECT-Geräte berechnen (pro Messung)
--- Formel: (power_mw / 1.000.000) * (Intervall_in_Sekunden / 3600) * Preis_EUR_pro_kWh
+-- Bevorzugt wird der gemessene Verbrauch energy_wh (Differenz der Energiezähler in Wh).
+-- Fehlt er (erster Messwert, Geräte ohne Zähler), wird aus der Momentanleistung geschätzt:
+-- (power_mw / 1.000.000) * (Intervall_in_Sekunden / 3600) * Preis_EUR_pro_kWh
 SELECT 
     d.ain,
     d.device_name,
     d.multimeter_power as power_mw,
+    d.energy_wh,
     d.time,
-    (d.multimeter_power / 1000000.0) * (300 / 3600.0) * p.price_eur_per_kwh as cost_eur_per_interval,
+    COALESCE(d.energy_wh / 1000.0, (d.multimeter_power / 1000000.0) * (300 / 3600.0)) * p.price_eur_per_kwh as cost_eur_per_interval,
     p.price_eur_per_kwh
 FROM dect200_data d
 CROSS JOIN (
@@ -25,7 +28,7 @@ CROSS JOIN (
     ORDER BY valid_from DESC 
     LIMIT 1
 ) p
-WHERE d.multimeter_power IS NOT NULL
+WHERE (d.energy_wh IS NOT NULL OR d.multimeter_power IS NOT NULL)
 ORDER BY d.time DESC
 LIMIT 100;
 
@@ -36,7 +39,7 @@ SELECT
     d.device_name,
     COUNT(*) as anzahl_messungen,
     AVG(d.multimeter_power) as durchschnitt_mw,
-    SUM((d.multimeter_power / 1000000.0) * (300 / 3600.0) * p.price_eur_per_kwh) as kosten_eur_pro_tag,
+    SUM(COALESCE(d.energy_wh / 1000.0, (d.multimeter_power / 1000000.0) * (300 / 3600.0))) * p.price_eur_per_kwh as kosten_eur_pro_tag,
     p.price_eur_per_kwh
 FROM dect200_data d
 CROSS JOIN (
@@ -46,7 +49,7 @@ CROSS JOIN (
     ORDER BY valid_from DESC 
     LIMIT 1
 ) p
-WHERE d.multimeter_power IS NOT NULL
+WHERE (d.energy_wh IS NOT NULL OR d.multimeter_power IS NOT NULL)
 GROUP BY DATE(d.time), d.ain, d.device_name, p.price_eur_per_kwh
 ORDER BY tag DESC, d.ain
 LIMIT 30;
@@ -56,7 +59,7 @@ SELECT
     DATE_FORMAT(d.time, '%Y-%m') as monat,
     COUNT(DISTINCT d.ain) as anzahl_geraete,
     COUNT(*) as anzahl_messungen,
-    SUM((d.multimeter_power / 1000000.0) * (300 / 3600.0) * p.price_eur_per_kwh) as gesamtkosten_eur,
+    SUM(COALESCE(d.energy_wh / 1000.0, (d.multimeter_power / 1000000.0) * (300 / 3600.0))) * p.price_eur_per_kwh as gesamtkosten_eur,
     p.price_eur_per_kwh
 FROM dect200_data d
 CROSS JOIN (
@@ -66,7 +69,7 @@ CROSS JOIN (
     ORDER BY valid_from DESC 
     LIMIT 1
 ) p
-WHERE d.multimeter_power IS NOT NULL
+WHERE (d.energy_wh IS NOT NULL OR d.multimeter_power IS NOT NULL)
 GROUP BY DATE_FORMAT(d.time, '%Y-%m'), p.price_eur_per_kwh
 ORDER BY monat DESC;
 
@@ -77,7 +80,7 @@ SELECT
     COUNT(*) as anzahl_messungen,
     AVG(d.multimeter_power) as durchschnitt_mw,
     MAX(d.multimeter_power) as max_mw,
-    SUM((d.multimeter_power / 1000000.0) * (300 / 3600.0) * p.price_eur_per_kwh) as kosten_eur_7_tage,
+    SUM(COALESCE(d.energy_wh / 1000.0, (d.multimeter_power / 1000000.0) * (300 / 3600.0))) * p.price_eur_per_kwh as kosten_eur_7_tage,
     p.price_eur_per_kwh
 FROM dect200_data d
 CROSS JOIN (
@@ -87,7 +90,7 @@ CROSS JOIN (
     ORDER BY valid_from DESC 
     LIMIT 1
 ) p
-WHERE d.multimeter_power IS NOT NULL
+WHERE (d.energy_wh IS NOT NULL OR d.multimeter_power IS NOT NULL)
   AND d.time >= DATE_SUB(NOW(), INTERVAL 7 DAY)
 GROUP BY d.ain, d.device_name, p.price_eur_per_kwh
 ORDER BY kosten_eur_7_tage DESC;
@@ -100,8 +103,9 @@ SELECT
     d.device_name,
     d.multimeter_power as power_mw,
     (d.multimeter_power / 1000.0) as power_w,
-    (d.multimeter_power / 1000000.0) * (300 / 3600.0) as energy_kwh_per_interval,
-    (d.multimeter_power / 1000000.0) * (300 / 3600.0) * p.price_eur_per_kwh as cost_eur_per_interval,
+    d.energy_wh,
+    COALESCE(d.energy_wh / 1000.0, (d.multimeter_power / 1000000.0) * (300 / 3600.0)) as energy_kwh_per_interval,
+    COALESCE(d.energy_wh / 1000.0, (d.multimeter_power / 1000000.0) * (300 / 3600.0)) * p.price_eur_per_kwh as cost_eur_per_interval,
     p.price_eur_per_kwh
 FROM dect200_data d
 CROSS JOIN (
@@ -121,8 +125,8 @@ SELECT
     d.device_name,
     COUNT(*) as messungen_30_tage,
     AVG(d.multimeter_power) as durchschnitt_mw,
-    SUM((d.multimeter_power / 1000000.0) * (300 / 3600.0) * p.price_eur_per_kwh) as kosten_30_tage_eur,
-    SUM((d.multimeter_power / 1000000.0) * (300 / 3600.0) * p.price_eur_per_kwh) * (365.0 / 30.0) as hochgerechnete_jahreskosten_eur,
+    SUM(COALESCE(d.energy_wh / 1000.0, (d.multimeter_power / 1000000.0) * (300 / 3600.0))) * p.price_eur_per_kwh as kosten_30_tage_eur,
+    SUM(COALESCE(d.energy_wh / 1000.0, (d.multimeter_power / 1000000.0) * (300 / 3600.0))) * p.price_eur_per_kwh * (365.0 / 30.0) as hochgerechnete_jahreskosten_eur,
     p.price_eur_per_kwh
 FROM dect200_data d
 CROSS JOIN (
@@ -132,7 +136,7 @@ CROSS JOIN (
     ORDER BY valid_from DESC 
     LIMIT 1
 ) p
-WHERE d.multimeter_power IS NOT NULL
+WHERE (d.energy_wh IS NOT NULL OR d.multimeter_power IS NOT NULL)
   AND d.time >= DATE_SUB(NOW(), INTERVAL 30 DAY)
 GROUP BY d.ain, d.device_name, p.price_eur_per_kwh
 ORDER BY hochgerechnete_jahreskosten_eur DESC;
@@ -1,16 +1,30 @@
 import time
 import os
 import re
+import asyncio
 import logging
 from fritzconnection import FritzConnection
 import mysql.connector
 import speedtest
 from notify import notify_all
+from async_tr064 import TR064_CONCURRENCY, TR064_CALL_TIMEOUT, AsyncFritzClient
 from weather_collector import create_weather_table, collect_weather
+from wan_traffic_collector import create_wan_traffic_table, start_wan_traffic_collector
+from wan_outage_probe import create_wan_outages_table, start_wan_outage_probe
+from mqtt_publisher import start_mqtt_publisher
+from config_reload import start_config_reloader
+from read_api import start_read_api, invalidate_cache
+from adaptive_polling import ADAPTIVE_POLLING, AdaptivePollScheduler
+from device_stats import DEVICE_STATS_ENABLED, create_device_stats_tables, start_device_stats
+from retention import RETENTION_POLICIES, create_rollup_tables, start_retention
+from coordination import COLLECTOR_SHARDING, LEASE_HEARTBEAT_INTERVAL, create_lease_tables, start_coordinator
 from electricity_price import (
     create_electricity_price_table,
     store_electricity_price,
-    ELECTRICITY_PRICE_EUR_PER_KWH
+    ELECTRICITY_PRICE_EUR_PER_KWH,
+    EnergyCounterTracker,
+    get_current_electricity_price,
+    update_electricity_price
 )
 
 # Optional: spezifische Exceptions, falls verfügbar
@@ -38,6 +52,11 @@ FRITZBOX_PASSWORD = os.getenv("FRITZBOX_PASSWORD", "deinpasswort")
 # Optionaler Filter: Wenn leer -> ALLE Geräte speichern
 _DECT_AINS_RAW = os.getenv("DECT_AINS", "").strip()
 DECT_AINS_FILTER = [a.strip() for a in _DECT_AINS_RAW.split(",") if a.strip()]
+# Vorab ohne Leerzeichen normalisiert für den direkten Abgleich mit der kompakten AIN
+DECT_AINS_FILTER_SET = {re.sub(r"\s+", "", a) for a in DECT_AINS_FILTER}
+
+# Intervall für die vollständige Neuerkennung der DECT-Geräte (Sekunden)
+DECT_DISCOVERY_INTERVAL = int(os.getenv("DECT_DISCOVERY_INTERVAL", "3600"))
 
 SQL_CONFIG = {
     "user": os.getenv("SQL_USER", "sqluser"),
@@ -47,6 +66,17 @@ SQL_CONFIG = {
     "autocommit": True
 }
 
+# Gerätekarte aus der letzten vollständigen Auflistung:
+# kompakte AIN -> {"ain": AIN in der Schreibweise der FritzBox, "index": Index für GetGenericDeviceInfos}
+_DEVICE_MAP: dict[str, dict] = {}
+_device_map_updated = 0.0
+# Nächster Zyklus listet vollständig auf, auch wenn die Karte noch aktuell ist (z. B. neuer DECT_AINS-Filter)
+_force_discovery = False
+_homeauto_service: str | None = None
+_fritz_conn: FritzConnection | None = None
+# Letzte Energiezählerstände pro AIN für den Verbrauch je Intervall
+_energy_counters = EnergyCounterTracker()
+
 def create_tables():
     logger.info("Prüfe und erstelle ggf. SQL-Tabellen...")
     table_sql = [
@@ -71,6 +101,8 @@ def create_tables():
             hkr_is_temperature INT,
             hkr_set_ventil_status VARCHAR(16),
             hkr_set_temperature INT,
+            multimeter_energy INT,
+            energy_wh INT,
             time DATETIME
         )""",
         """CREATE TABLE IF NOT EXISTS speedtest_results (
@@ -103,6 +135,14 @@ def create_tables():
     # Wetter- und Strompreis-Tabellen erstellen
     try:
         create_weather_table()
+        create_wan_traffic_table()
+        create_wan_outages_table()
+        if COLLECTOR_SHARDING:
+            create_lease_tables()
+        if RETENTION_POLICIES:
+            create_rollup_tables()
+        if DEVICE_STATS_ENABLED:
+            create_device_stats_tables()
         create_electricity_price_table()
         store_electricity_price()
         logger.info("Strompreis konfiguriert: %s EUR/kWh", ELECTRICITY_PRICE_EUR_PER_KWH)
@@ -120,7 +160,9 @@ def ensure_columns():
         "switch_state": "VARCHAR(16)",
         "hkr_is_temperature": "INT",
         "hkr_set_ventil_status": "VARCHAR(16)",
-        "hkr_set_temperature": "INT"
+        "hkr_set_temperature": "INT",
+        "multimeter_energy": "INT",
+        "energy_wh": "INT"
     }
     conn = mysql.connector.connect(**SQL_CONFIG)
     cursor = conn.cursor()
@@ -139,10 +181,14 @@ def ensure_columns():
     conn.close()
 
 def _resolve_homeauto_service(fc: FritzConnection) -> str | None:
-    """Service-Namen ermitteln, z. B. 'X_AVM-DE_Homeauto1'."""
+    """Service-Namen ermitteln, z. B. 'X_AVM-DE_Homeauto1' (wird nach dem ersten Fund gemerkt)."""
+    global _homeauto_service
+    if _homeauto_service:
+        return _homeauto_service
     try:
         for name in fc.services.keys():
             if name.startswith("X_AVM-DE_Homeauto"):
+                _homeauto_service = name
                 return name
     except Exception as e:
         logger.error("Homeauto-Service konnte nicht ermittelt werden: %s", e)
@@ -152,21 +198,133 @@ def _is_index_out_of_range_error(err: Exception) -> bool:
     rep = repr(err)
     return ("SpecifiedArrayIndexInvalid" in rep) or ("errorCode: 713" in rep) or isinstance(err, FritzArrayIndexError)
 
-def _enumerate_homeauto_devices(fc: FritzConnection, service_name: str, max_iter: int = 256) -> list[dict]:
-    """Liest Geräte über GetGenericDeviceInfos per Index 0..n, bis 713 kommt."""
+async def _enumerate_homeauto_devices_async(
+    client: AsyncFritzClient, service_name: str, max_iter: int = 256
+) -> tuple[list[dict], bool]:
+    """
+    Liest Geräte über GetGenericDeviceInfos per Index 0..n, bis 713 kommt.
+
+    Die Indizes werden blockweise gleichzeitig abgefragt. Der erste Block deckt die bekannte
+    Geräteanzahl plus einen Index ab, so dass im Normalfall eine Runde genügt.
+
+    Returns:
+        tuple: (gelesene Geräte, True nur wenn die Auflistung regulär mit 713 endete)
+    """
     devices = []
-    for i in range(max_iter):
+    complete = True
+    start = 0
+    batch = max(client.concurrency, len(_DEVICE_MAP) + 1)
+    while start < max_iter:
+        indexes = range(start, min(start + batch, max_iter))
+        results = await client.gather(*((service_name, "GetGenericDeviceInfos", {"NewIndex": i}) for i in indexes))
+        for i, result in zip(indexes, results):
+            if not isinstance(result, BaseException):
+                devices.append(result)
+            elif _is_index_out_of_range_error(result):
+                if complete:
+                    logger.info("Geräte-Auflistung beendet bei Index %s (713).", i)
+                return devices, complete
+            else:
+                # Übrige Ergebnisse des Blocks noch übernehmen, die Auflistung gilt aber als abgebrochen
+                logger.error("GetGenericDeviceInfos Fehler bei Index %s: %s", i, result)
+                notify_all(f"Fehler bei GetGenericDeviceInfos Index {i}: {result}")
+                complete = False
+        if not complete:
+            return devices, False
+        start += batch
+        batch = client.concurrency
+    return devices, complete
+
+def _enumerate_homeauto_devices(fc: FritzConnection, service_name: str, max_iter: int = 256) -> list[dict]:
+    """Synchroner Wrapper um _enumerate_homeauto_devices_async (nur die gelesenen Geräte)."""
+    devices, _ = asyncio.run(_enumerate_homeauto_devices_async(AsyncFritzClient(fc), service_name, max_iter))
+    return devices
+
+async def _fetch_specific_device_async(client: AsyncFritzClient, service_name: str, ain: str) -> dict:
+    """Liest ein einzelnes Gerät über GetSpecificDeviceInfos (Antwort enthält keine AIN)."""
+    info = dict(await client.call(service_name, "GetSpecificDeviceInfos", NewAIN=ain))
+    info.setdefault("NewAIN", ain)
+    return info
+
+async def _fetch_mapped_device_async(client: AsyncFritzClient, service_name: str, ain: str) -> dict:
+    """Liest ein Gerät der Gerätekarte gezielt: per AIN, ersatzweise über den gemerkten Index."""
+    entry = _DEVICE_MAP.get(ain)
+    if entry is None:
+        return await _fetch_specific_device_async(client, service_name, ain)
+    try:
+        return await _fetch_specific_device_async(client, service_name, entry["ain"])
+    except Exception as e:
+        logger.debug("GetSpecificDeviceInfos für %s fehlgeschlagen (%s) – versuche Index %s", ain, e, entry["index"])
+    info = await client.call(service_name, "GetGenericDeviceInfos", NewIndex=entry["index"])
+    if _compact_ain(info.get("NewAIN")) != ain:
+        raise LookupError(f"Index {entry['index']} gehört nicht mehr zu {ain}")
+    return info
+
+def _update_device_map(raw_devices: list[dict]) -> tuple[set, set]:
+    """Übernimmt eine vollständige Auflistung in die Gerätekarte und meldet hinzugekommene/entfernte AINs."""
+    global _device_map_updated, _force_discovery
+    new_map = {}
+    for index, info in enumerate(raw_devices):
+        ain = _compact_ain(info.get("NewAIN"))
+        if ain:
+            new_map[ain] = {"ain": info.get("NewAIN"), "index": index}
+    added, removed = set(), set()
+    if _device_map_updated:
+        added = new_map.keys() - _DEVICE_MAP.keys()
+        removed = _DEVICE_MAP.keys() - new_map.keys()
+        if added:
+            logger.info("Neue DECT-Geräte erkannt: %s", ", ".join(sorted(added)))
+        if removed:
+            logger.warning("DECT-Geräte nicht mehr vorhanden: %s", ", ".join(sorted(removed)))
+    _DEVICE_MAP.clear()
+    _DEVICE_MAP.update(new_map)
+    _device_map_updated = time.time()
+    _force_discovery = False
+    return added, removed
+
+async def _collect_dect_devices_async(client: AsyncFritzClient, service_name: str, force: bool = False) -> list[dict]:
+    """
+    Liefert die normalisierten, gefilterten DECT-Geräte eines Zyklus.
+
+    Mit gesetztem DECT_AINS-Filter und aktueller Gerätekarte werden nur die gewünschten
+    Geräte gezielt (und gleichzeitig) abgefragt. Vollständig aufgelistet wird nur, wenn die
+    Karte älter als DECT_DISCOVERY_INTERVAL ist, eine gezielte Abfrage fehlschlägt oder
+    `force` gesetzt ist. Nur eine vollständige Auflistung ersetzt die Gerätekarte.
+    """
+    map_fresh = (
+        _DEVICE_MAP and not force and not _force_discovery
+        and time.time() - _device_map_updated < DECT_DISCOVERY_INTERVAL
+    )
+    if DECT_AINS_FILTER_SET and map_fresh:
+        wanted = sorted(ain for ain in DECT_AINS_FILTER_SET if ain in _DEVICE_MAP)
         try:
-            info = fc.call_action(service_name, "GetGenericDeviceInfos", NewIndex=i)
-            devices.append(info)
+            infos = await asyncio.gather(*(_fetch_mapped_device_async(client, service_name, ain) for ain in wanted))
+            return [_normalize_device_info(info) for info in infos]
         except Exception as e:
-            if _is_index_out_of_range_error(e):
-                logger.info("Geräte-Auflistung beendet bei Index %s (713).", i)
-                break
-            logger.error("GetGenericDeviceInfos Fehler bei Index %s: %s", i, e)
-            notify_all(f"Fehler bei GetGenericDeviceInfos Index {i}: {e}")
-            break
-    return devices
+            logger.warning("Gezielte DECT-Abfrage fehlgeschlagen (%s) – vollständige Neuerkennung.", e)
+
+    raw_devices, complete = await _enumerate_homeauto_devices_async(client, service_name)
+    if complete:
+        _, removed = _update_device_map(raw_devices)
+        for ain in removed:
+            _energy_counters.forget(ain)
+    else:
+        logger.warning("Geräte-Auflistung abgebrochen – Gerätekarte bleibt unverändert.")
+
+    # Normalisieren und optional filtern
+    normalized = []
+    for info in raw_devices:
+        dev = _normalize_device_info(info)
+        if not dev["ain"]:
+            continue
+        if DECT_AINS_FILTER_SET and dev["ain"] not in DECT_AINS_FILTER_SET:
+            continue
+        normalized.append(dev)
+    return normalized
+
+def _collect_dect_devices(fc: FritzConnection, service_name: str, force: bool = False) -> list[dict]:
+    """Synchroner Wrapper um _collect_dect_devices_async."""
+    return asyncio.run(_collect_dect_devices_async(AsyncFritzClient(fc), service_name, force))
 
 def _compact_ain(ain: str) -> str:
     return re.sub(r"\s+", "", ain or "").strip()
@@ -189,7 +347,9 @@ def _normalize_device_info(info: dict) -> dict:
             "switch_state": None,
             "hkr_is_temperature": None,
             "hkr_set_ventil_status": None,
-            "hkr_set_temperature": None
+            "hkr_set_temperature": None,
+            "multimeter_energy": None,
+            "energy_wh": None
         }
 
     switch_state_str = str(info.get("NewSwitchState") or "").upper()  # OFF/ON/...
@@ -197,6 +357,7 @@ def _normalize_device_info(info: dict) -> dict:
     state = state_map.get(switch_state_str, None)
 
     multimeter_power = info.get("NewMultimeterPower")
+    multimeter_energy = info.get("NewMultimeterEnergy")
     temperature_celsius = info.get("NewTemperatureCelsius")
 
     # Integer-Wandlungen mit Fail-Safe
@@ -204,6 +365,10 @@ def _normalize_device_info(info: dict) -> dict:
         multimeter_power = int(multimeter_power) if multimeter_power is not None else None
     except Exception:
         multimeter_power = None
+    try:
+        multimeter_energy = int(multimeter_energy) if multimeter_energy is not None else None
+    except Exception:
+        multimeter_energy = None
     try:
         temperature_celsius = int(temperature_celsius) if temperature_celsius is not None else None
     except Exception:
@@ -226,70 +391,145 @@ def _normalize_device_info(info: dict) -> dict:
         "hkr_is_temperature": info.get("NewHkrIsTemperature"),
         "hkr_set_ventil_status": info.get("NewHkrSetVentilStatus"),
         "hkr_set_temperature": info.get("NewHkrSetTemperature"),
+        "multimeter_energy": multimeter_energy,  # kumulativer Zählerstand (Wh)
+        "energy_wh": None,  # Verbrauch seit dem letzten Messwert, siehe _apply_energy_deltas
     }
 
-def get_fritz_data():
-    logger.info("Frage FritzBox-Daten ab...")
-    fc = FritzConnection(address=FRITZBOX_HOST, user=FRITZBOX_USER, password=FRITZBOX_PASSWORD)
-    data = {}
+def _apply_energy_deltas(devices: list[dict], now: float):
+    """Ergänzt energy_wh (Verbrauch seit dem letzten Messwert) aus den Energiezählern."""
+    for device in devices:
+        device["energy_wh"] = _energy_counters.update(device["ain"], device.get("multimeter_energy"), now)
+
+def _fritz_connection() -> FritzConnection:
+    """Liefert die wiederverwendete FritzConnection (Keep-Alive-Session und Digest-Auth bleiben erhalten)."""
+    global _fritz_conn
+    if _fritz_conn is None:
+        _fritz_conn = FritzConnection(
+            address=FRITZBOX_HOST, user=FRITZBOX_USER, password=FRITZBOX_PASSWORD, timeout=TR064_CALL_TIMEOUT
+        )
+    return _fritz_conn
 
-    # Online-/IP-Infos
+def _unwrap(result):
+    """Wirft ein von AsyncFritzClient.gather geliefertes Exception-Objekt erneut."""
+    if isinstance(result, BaseException):
+        raise result
+    return result
+
+async def _wan_status_async(client: AsyncFritzClient) -> tuple:
+    """Liefert (Online-Status, externe IP), zuerst über den Kabel-, dann über den DSL-Service."""
     try:
-        data["online"] = fc.call_action("WANIPConnection", "GetStatusInfo")["NewConnectionStatus"]
-        data["external_ip"] = fc.call_action("WANIPConnection", "GetExternalIPAddress")["NewExternalIPAddress"]
-        logger.info("Online-Status (Cable): %s, Externe IP: %s", data['online'], data['external_ip'])
+        status, ip = await client.gather(
+            ("WANIPConnection", "GetStatusInfo", None),
+            ("WANIPConnection", "GetExternalIPAddress", None),
+        )
+        online, external_ip = _unwrap(status)["NewConnectionStatus"], _unwrap(ip)["NewExternalIPAddress"]
+        logger.info("Online-Status (Cable): %s, Externe IP: %s", online, external_ip)
+        return online, external_ip
     except Exception as e:
         try:
-            data["online"] = fc.call_action("WANPPPConnection", "GetStatus")["NewConnectionStatus"]
-            data["external_ip"] = fc.call_action("WANPPPConnection", "GetExternalIPAddress")["NewExternalIPAddress"]
-            logger.info("Online-Status (DSL): %s, Externe IP: %s", data['online'], data['external_ip'])
+            status, ip = await client.gather(
+                ("WANPPPConnection", "GetStatus", None),
+                ("WANPPPConnection", "GetExternalIPAddress", None),
+            )
+            online, external_ip = _unwrap(status)["NewConnectionStatus"], _unwrap(ip)["NewExternalIPAddress"]
+            logger.info("Online-Status (DSL): %s, Externe IP: %s", online, external_ip)
+            return online, external_ip
         except Exception as e2:
             logger.error("Fehler beim Abfragen FritzBox-Status (beide Methoden): Cable: %s, DSL: %s", e, e2)
             notify_all(f"Fehler beim Abfragen FritzBox-Status: {e2}")
-            data["online"] = None
-            data["external_ip"] = None
+            return None, None
 
-    # Aktive Geräte (LAN/WLAN)
+async def _active_devices_async(client: AsyncFritzClient):
+    """Liefert die Anzahl aktiver Geräte (LAN/WLAN)."""
     try:
-        data["active_devices"] = fc.call_action("Hosts", "GetHostNumberOfEntries")["NewHostNumberOfEntries"]
-        logger.info("Aktive Geräte: %s", data['active_devices'])
+        active_devices = (await client.call("Hosts", "GetHostNumberOfEntries"))["NewHostNumberOfEntries"]
+        logger.info("Aktive Geräte: %s", active_devices)
+        return active_devices
     except Exception as e:
         logger.error("Fehler beim Abfragen der Geräteanzahl: %s", e)
         notify_all(f"Fehler beim Abfragen Geräteanzahl: {e}")
-        data["active_devices"] = None
+        return None
 
-    # Smart-Home über Homeauto-TR-064
-    data["dect"] = []
-    service_name = _resolve_homeauto_service(fc)
-    if not service_name:
-        logger.error("Kein X_AVM-DE_Homeauto Service gefunden – DECT-Daten werden leer gesetzt.")
-        return data
+async def get_fritz_data_async(fc: FritzConnection, include_dect: bool = True, concurrency: int = TR064_CONCURRENCY,
+                               force_discovery: bool = False, executor=None):
+    """
+    Fragt WAN-Status, externe IP, Geräteanzahl und DECT-Geräte eines Zyklus gleichzeitig ab.
 
-    raw_devices = _enumerate_homeauto_devices(fc, service_name)
+    Args:
+        fc: FritzConnection, deren call_action genutzt wird
+        include_dect (bool): DECT-Geräte mit abfragen
+        force_discovery (bool): DECT-Geräte vollständig auflisten, auch wenn die Gerätekarte aktuell ist
+        concurrency (int): Maximale Anzahl gleichzeitiger TR-064-Anfragen (1 = nacheinander)
+        executor: Optionaler eigener Thread-Pool; sonst der gemeinsame mit TR064_CONCURRENCY Threads
+    """
+    client = AsyncFritzClient(fc, concurrency=concurrency, executor=executor)
+    jobs = [_wan_status_async(client), _active_devices_async(client)]
 
-    # Normalisieren und optional filtern
-    normalized = []
-    for info in raw_devices:
-        dev = _normalize_device_info(info)
-        if not dev["ain"]:
-            continue
-        if DECT_AINS_FILTER:
-            ain_compact = dev["ain"].replace(" ", "")
-            if not any(ain_compact == target.replace(" ", "") for target in DECT_AINS_FILTER):
-                continue
-        normalized.append(dev)
+    # Smart-Home über Homeauto-TR-064
+    service_name = None
+    if include_dect:
+        service_name = _resolve_homeauto_service(fc)
+        if service_name:
+            jobs.append(_collect_dect_devices_async(client, service_name, force_discovery))
+        else:
+            logger.error("Kein X_AVM-DE_Homeauto Service gefunden – DECT-Daten werden leer gesetzt.")
+
+    results = await asyncio.gather(*jobs)
+    data = {}
+    data["online"], data["external_ip"] = results[0]
+    data["active_devices"] = results[1]
+    data["dect"] = results[2] if service_name else []
+    _apply_energy_deltas(data["dect"], time.time())
 
     # Logging
-    for d in normalized:
+    for d in data["dect"]:
         logger.info(
-            "DECT %s: State=%s(%s), Power(mW)=%s, Temp(0.1C)=%s, Prod='%s', Name='%s'",
-            d['ain'], d['state'], d['switch_state'], d['multimeter_power'],
-            d['temperature_celsius'], d['product_name'], d['device_name']
+            "DECT %s: State=%s(%s), Power(mW)=%s, Energy(Wh)=%s (+%s), Temp(0.1C)=%s, Prod='%s', Name='%s'",
+            d['ain'], d['state'], d['switch_state'], d['multimeter_power'], d['multimeter_energy'],
+            d['energy_wh'], d['temperature_celsius'], d['product_name'], d['device_name']
         )
+    return data
 
-    data["dect"] = normalized
+def get_fritz_data(include_dect: bool = True, force_discovery: bool = False):
+    """Synchroner Wrapper um get_fritz_data_async mit der wiederverwendeten FritzConnection."""
+    global _fritz_conn
+    logger.info("Frage FritzBox-Daten ab...")
+    data = asyncio.run(get_fritz_data_async(_fritz_connection(), include_dect, force_discovery=force_discovery))
+    if data["online"] is None and data["active_devices"] is None:
+        # FritzBox nicht erreichbar: im nächsten Zyklus neu verbinden
+        _fritz_conn = None
     return data
 
+def _insert_dect_rows(cursor, devices):
+    for device in devices:
+        cursor.execute(
+            """
+            INSERT INTO dect200_data (
+                ain, state, power, temperature,
+                product_name, device_name, multimeter_power, temperature_celsius,
+                switch_state, hkr_is_temperature, hkr_set_ventil_status, hkr_set_temperature,
+                multimeter_energy, energy_wh, time
+            )
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
+            """,
+            (
+                device["ain"],
+                device["state"],
+                device["power"],
+                device["temperature"],
+                device["product_name"],
+                device["device_name"],
+                device["multimeter_power"],
+                device["temperature_celsius"],
+                device["switch_state"],
+                device["hkr_is_temperature"],
+                device["hkr_set_ventil_status"],
+                device["hkr_set_temperature"],
+                device.get("multimeter_energy"),
+                device.get("energy_wh"),
+            )
+        )
+
 def write_to_sql(data):
     logger.info("Schreibe FritzBox-Daten in die Datenbank...")
     for attempt in range(3):
@@ -303,34 +543,11 @@ def write_to_sql(data):
                 """,
                 (data.get("online"), data.get("external_ip"), data.get("active_devices"))
             )
-            for device in data.get("dect", []):
-                cursor.execute(
-                    """
-                    INSERT INTO dect200_data (
-                        ain, state, power, temperature,
-                        product_name, device_name, multimeter_power, temperature_celsius,
-                        switch_state, hkr_is_temperature, hkr_set_ventil_status, hkr_set_temperature, time
-                    )
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
-                    """,
-                    (
-                        device["ain"],
-                        device["state"],
-                        device["power"],
-                        device["temperature"],
-                        device["product_name"],
-                        device["device_name"],
-                        device["multimeter_power"],
-                        device["temperature_celsius"],
-                        device["switch_state"],
-                        device["hkr_is_temperature"],
-                        device["hkr_set_ventil_status"],
-                        device["hkr_set_temperature"],
-                    )
-                )
+            _insert_dect_rows(cursor, data.get("dect", []))
             cursor.close()
             conn.close()
             logger.info("FritzBox- und DECT-Daten erfolgreich gespeichert.")
+            invalidate_cache()
             return
         except Exception as e:
             logger.error("Fehler beim Schreiben in die Datenbank (Versuch %s): %s", attempt+1, e)
@@ -338,6 +555,79 @@ def write_to_sql(data):
             time.sleep(10)
     logger.error("Daten konnten nach 3 Versuchen nicht geschrieben werden.")
 
+def write_dect_to_sql(devices):
+    if not devices:
+        return
+    for attempt in range(3):
+        try:
+            conn = mysql.connector.connect(**SQL_CONFIG)
+            cursor = conn.cursor()
+            _insert_dect_rows(cursor, devices)
+            cursor.close()
+            conn.close()
+            logger.info("DECT-Daten für %s Gerät(e) gespeichert.", len(devices))
+            invalidate_cache()
+            return
+        except Exception as e:
+            logger.error("Fehler beim Schreiben DECT-Daten (Versuch %s): %s", attempt+1, e)
+            notify_all(f"Fehler beim Schreiben DECT-Daten: {e}")
+            time.sleep(10)
+    logger.error("DECT-Daten konnten nach 3 Versuchen nicht geschrieben werden.")
+
+def poll_due_devices(scheduler: AdaptivePollScheduler) -> list[dict]:
+    """Fragt nur die fälligen Geräte (gleichzeitig) per GetSpecificDeviceInfos ab und aktualisiert deren Planung."""
+    now = time.time()
+    due = scheduler.due(now)
+    if not due:
+        return []
+    fc = _fritz_connection()
+    service_name = _resolve_homeauto_service(fc)
+    if not service_name:
+        logger.error("Kein X_AVM-DE_Homeauto Service gefunden – adaptive Abfrage übersprungen.")
+        return []
+
+    async def fetch_due():
+        client = AsyncFritzClient(fc)
+        return await asyncio.gather(
+            *(_fetch_mapped_device_async(client, service_name, ain) for ain in due), return_exceptions=True
+        )
+
+    devices = []
+    for ain, info in zip(due, asyncio.run(fetch_due())):
+        if isinstance(info, BaseException):
+            delay = scheduler.failed(ain, now)
+            logger.error("GetSpecificDeviceInfos Fehler für %s: %s – neuer Versuch in %.0f s", ain, info, delay)
+            continue
+        dev = _normalize_device_info(info)
+        _apply_energy_deltas([dev], now)
+        interval = scheduler.observe(dev, now)
+        logger.info(
+            "DECT %s: State=%s(%s), Power(mW)=%s, Temp(0.1C)=%s, nächste Abfrage in %.0f s",
+            dev['ain'], dev['state'], dev['switch_state'], dev['multimeter_power'],
+            dev['temperature_celsius'], interval
+        )
+        devices.append(dev)
+    return devices
+
+def _apply_config(changes: dict, scheduler: AdaptivePollScheduler | None = None):
+    """Übernimmt neu geladene Einstellungen, ohne Verbindungen oder Gerätekarte zu verwerfen."""
+    global DECT_AINS_FILTER, DECT_AINS_FILTER_SET, DECT_DISCOVERY_INTERVAL, _force_discovery
+    if "DECT_AINS" in changes:
+        DECT_AINS_FILTER = changes["DECT_AINS"]
+        DECT_AINS_FILTER_SET = {_compact_ain(a) for a in DECT_AINS_FILTER}
+        if scheduler is not None and DECT_AINS_FILTER_SET:
+            for ain in list(scheduler.devices):
+                if ain not in DECT_AINS_FILTER_SET:
+                    scheduler.forget(ain)
+        # Neu gewünschte Geräte sind evtl. noch nicht in der Gerätekarte: beim nächsten Zyklus neu erkennen
+        if not DECT_AINS_FILTER_SET or DECT_AINS_FILTER_SET - _DEVICE_MAP.keys():
+            _force_discovery = True
+    if "DECT_DISCOVERY_INTERVAL" in changes:
+        DECT_DISCOVERY_INTERVAL = changes["DECT_DISCOVERY_INTERVAL"]
+    if "ELECTRICITY_PRICE_EUR_PER_KWH" in changes:
+        update_electricity_price(changes["ELECTRICITY_PRICE_EUR_PER_KWH"])
+        invalidate_cache()
+
 def run_speedtest():
     logger.info("Starte Speedtest...")
     for attempt in range(3):
@@ -379,7 +669,7 @@ def write_speedtest_to_sql(result):
                 time.sleep(10)
         logger.error("Speedtest-Daten konnten nach 3 Versuchen nicht geschrieben werden.")
 
-if __name__ == "__main__":
+def main():
     interval = int(os.getenv("COLLECT_INTERVAL", "300"))
     speedtest_interval = int(os.getenv("SPEEDTEST_INTERVAL", "3600"))
     weather_interval = int(os.getenv("WEATHER_INTERVAL", "3600"))  # Standard: stündlich
@@ -388,15 +678,93 @@ if __name__ == "__main__":
     create_tables()
     logger.info("Starte FritzBox-Collector...")
     logger.info("Strompreis: %s EUR/kWh", ELECTRICITY_PRICE_EUR_PER_KWH)
+    # Bei mehreren Replikas bearbeitet jede nur die Aufgaben, deren Lease sie hält
+    coordinator = start_coordinator([FRITZBOX_HOST, "speedtest", "weather", "retention"])
+
+    def owns(target):
+        return coordinator is None or coordinator.owns(target)
+
+    mqtt = start_mqtt_publisher()
+    start_wan_traffic_collector(lambda: owns(FRITZBOX_HOST))
+    start_wan_outage_probe(lambda: owns(FRITZBOX_HOST), mqtt.publish_wan_status if mqtt else None)
+    start_read_api()
+    start_retention(lambda: owns("retention"))
+    scheduler = AdaptivePollScheduler() if ADAPTIVE_POLLING else None
+    stats_engine = start_device_stats()
+    reloader = start_config_reloader({
+        "DECT_AINS": DECT_AINS_FILTER,
+        "DECT_DISCOVERY_INTERVAL": DECT_DISCOVERY_INTERVAL,
+        "COLLECT_INTERVAL": interval,
+        "SPEEDTEST_INTERVAL": speedtest_interval,
+        "WEATHER_INTERVAL": weather_interval,
+        "ELECTRICITY_PRICE_EUR_PER_KWH": ELECTRICITY_PRICE_EUR_PER_KWH,
+    }, current={
+        # Nach einem Neustart gilt der zuletzt übernommene Preis aus der Datenbank, nicht die Umgebung
+        "ELECTRICITY_PRICE_EUR_PER_KWH": float(get_current_electricity_price()),
+    })
+    last_collect = 0
+    last_discovery = 0
     while True:
-        fritz_data = get_fritz_data()
-        write_to_sql(fritz_data)
+        # Geänderte Konfiguration zwischen zwei Zyklen übernehmen
+        changes = reloader.poll()
+        if changes:
+            _apply_config(changes, scheduler)
+            interval = changes.get("COLLECT_INTERVAL", interval)
+            speedtest_interval = changes.get("SPEEDTEST_INTERVAL", speedtest_interval)
+            weather_interval = changes.get("WEATHER_INTERVAL", weather_interval)
+            if "DECT_AINS" in changes:
+                last_discovery = 0
         now = time.time()
-        if now - last_speedtest > speedtest_interval:
+        if now - last_collect >= interval and owns(FRITZBOX_HOST):
+            if scheduler is None:
+                fritz_data = get_fritz_data()
+            else:
+                # Adaptiv: volle Geräteliste nur zur Erkennung neuer Geräte, sonst nur Status
+                discover = now - last_discovery >= DECT_DISCOVERY_INTERVAL
+                # Erkennung listet immer vollständig auf, unabhängig vom Alter der Gerätekarte
+                fritz_data = get_fritz_data(include_dect=discover, force_discovery=discover)
+                if discover:
+                    for dev in fritz_data["dect"]:
+                        scheduler.observe(dev, now)
+                    # Nur Geräte verwerfen, die eine vollständige Auflistung in diesem Zyklus nicht mehr fand
+                    if _DEVICE_MAP and _device_map_updated >= now:
+                        for ain in list(scheduler.devices):
+                            if ain not in _DEVICE_MAP:
+                                scheduler.forget(ain)
+                    last_discovery = now
+            write_to_sql(fritz_data)
+            if mqtt is not None:
+                mqtt.publish_fritz_data(fritz_data)
+            if stats_engine is not None:
+                stats_engine.process(fritz_data["dect"], now)
+            last_collect = now
+        if scheduler is not None and owns(FRITZBOX_HOST):
+            polled = poll_due_devices(scheduler)
+            write_dect_to_sql(polled)
+            if mqtt is not None:
+                mqtt.publish_dect(polled)
+            if stats_engine is not None:
+                stats_engine.process(polled, now)
+        if now - last_speedtest > speedtest_interval and owns("speedtest"):
             speed_result = run_speedtest()
             write_speedtest_to_sql(speed_result)
+            if mqtt is not None:
+                mqtt.publish_speedtest(speed_result)
             last_speedtest = now
-        if now - last_weather > weather_interval:
-            collect_weather()
+        if now - last_weather > weather_interval and owns("weather"):
+            weather = collect_weather()
+            if mqtt is not None:
+                mqtt.publish_weather(weather)
             last_weather = now
-        time.sleep(interval)
\ No newline at end of file
+        # Wartezeit endet vorzeitig bei SIGHUP oder geänderter Konfigurationsdatei
+        if not owns(FRITZBOX_HOST):
+            # Standby: nach Ablauf fremder Leases zügig übernehmen können
+            reloader.wait(min(interval, LEASE_HEARTBEAT_INTERVAL))
+        elif scheduler is None:
+            reloader.wait(interval)
+        else:
+            wake = min(last_collect + interval, scheduler.next_due() or last_collect + interval)
+            reloader.wait(max(wake - time.time(), 1))
+
+if __name__ == "__main__":
+    main()
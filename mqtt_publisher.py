@@ -0,0 +1,183 @@
+"""
+MQTT Publisher Module
+
+Optionale Ausgabe der normalisierten Messwerte (DECT pro AIN, WAN-Status,
+Speedtest, Wetter) per MQTT, damit Hausautomationen Änderungen sofort sehen
+statt MySQL abzufragen.
+
+Jedes Thema trägt den letzten Wert als Retained-Nachricht. Veröffentlicht wird
+nur bei Änderung oder wenn seit der letzten Nachricht MQTT_HEARTBEAT_INTERVAL
+vergangen ist. Nachrichten landen zunächst in einem begrenzten Puffer, den ein
+Hintergrund-Thread abarbeitet: Ist der Broker nicht erreichbar, werden bei
+vollem Puffer die ältesten Nachrichten verworfen, die Erfassung blockiert nie.
+
+Benötigt paho-mqtt (optional, nur wenn MQTT_HOST gesetzt ist).
+"""
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+
+try:
+    import paho.mqtt.client as mqtt
+except ImportError:  # optionale Abhängigkeit
+    mqtt = None
+
+logger = logging.getLogger(__name__)
+
+# Broker (leer = MQTT deaktiviert)
+MQTT_HOST = os.getenv("MQTT_HOST", "").strip()
+MQTT_PORT = int(os.getenv("MQTT_PORT", "1883"))
+MQTT_USER = os.getenv("MQTT_USER", "")
+MQTT_PASSWORD = os.getenv("MQTT_PASSWORD", "")
+MQTT_CLIENT_ID = os.getenv("MQTT_CLIENT_ID", "fritzbox-collector")
+MQTT_TOPIC_PREFIX = os.getenv("MQTT_TOPIC_PREFIX", "fritzbox").strip("/")
+MQTT_QOS = int(os.getenv("MQTT_QOS", "0"))
+MQTT_RETAIN = os.getenv("MQTT_RETAIN", "1").lower() in ("1", "true", "yes")
+# Unveränderte Werte werden spätestens nach diesem Intervall (Sekunden) erneut gesendet
+MQTT_HEARTBEAT_INTERVAL = int(os.getenv("MQTT_HEARTBEAT_INTERVAL", "300"))
+# Maximale Anzahl gepufferter Nachrichten, solange der Broker nicht erreichbar ist
+MQTT_BUFFER_SIZE = int(os.getenv("MQTT_BUFFER_SIZE", "1000"))
+
+# Wartezeit bis zum nächsten Sendeversuch, wenn der Broker nicht verbunden ist
+RETRY_WAIT = 1.0
+
+
+class MqttPublisher:
+    """Veröffentlicht Messwerte bei Änderung über einen begrenzten, nicht blockierenden Puffer."""
+
+    def __init__(self, client, prefix=MQTT_TOPIC_PREFIX, qos=MQTT_QOS, retain=MQTT_RETAIN,
+                 heartbeat=MQTT_HEARTBEAT_INTERVAL, buffer_size=MQTT_BUFFER_SIZE):
+        self.client = client
+        self.prefix = prefix
+        self.qos = qos
+        self.retain = retain
+        self.heartbeat = heartbeat
+        self.dropped = 0
+        self._buffer = deque(maxlen=max(buffer_size, 1))
+        self._last = {}
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def start(self):
+        """Startet den Sende-Thread."""
+        self._thread = threading.Thread(target=self._sender_loop, name="mqtt-publisher", daemon=True)
+        self._thread.start()
+        return self
+
+    def publish(self, topic, payload, now=None):
+        """
+        Reiht eine Nachricht ein, sofern sich der Wert geändert hat oder der Heartbeat fällig ist.
+
+        Args:
+            topic (str): Thema unterhalb von MQTT_TOPIC_PREFIX
+            payload (dict): Wert, wird als JSON gesendet
+
+        Returns:
+            bool: True, wenn die Nachricht eingereiht wurde
+        """
+        now = now or time.time()
+        topic = f"{self.prefix}/{topic}"
+        message = json.dumps(payload, sort_keys=True, default=str)
+        with self._cond:
+            last = self._last.get(topic)
+            if last and last[0] == message and now - last[1] < self.heartbeat:
+                return False
+            self._last[topic] = (message, now)
+            if len(self._buffer) == self._buffer.maxlen:
+                # deque verwirft beim Anhängen automatisch die älteste Nachricht
+                self._drop(*self._buffer[0])
+            self._buffer.append((topic, message))
+            self._cond.notify()
+        return True
+
+    def _sender_loop(self):
+        while True:
+            with self._cond:
+                while not self._buffer:
+                    self._cond.wait()
+                topic, message = self._buffer.popleft()
+            try:
+                sent = self.client.is_connected() and self.client.publish(
+                    topic, message, qos=self.qos, retain=self.retain
+                ).rc == 0
+            except Exception as e:
+                logger.debug("MQTT-Veröffentlichung von %s fehlgeschlagen: %s", topic, e)
+                sent = False
+            if sent:
+                continue
+            with self._cond:
+                # Nur zurücklegen, wenn inzwischen kein neuerer Wert den Platz braucht
+                if len(self._buffer) < self._buffer.maxlen:
+                    self._buffer.appendleft((topic, message))
+                else:
+                    self._drop(topic, message)
+            time.sleep(RETRY_WAIT)
+
+    def _drop(self, topic, message):
+        """Zählt eine verworfene Nachricht; der Wert gilt danach nicht mehr als gesendet (Lock gehalten)."""
+        self.dropped += 1
+        if self.dropped % 100 == 1:
+            logger.warning("MQTT-Puffer voll, %s Nachricht(en) verworfen.", self.dropped)
+        last = self._last.get(topic)
+        if last and last[0] == message:
+            # Gleicher Wert beim nächsten Zyklus wird wieder eingereiht statt unterdrückt
+            del self._last[topic]
+
+    def publish_fritz_data(self, data, now=None):
+        """Veröffentlicht WAN-Status, Geräteanzahl und alle DECT-Geräte eines Zyklus."""
+        self.publish("wan", {
+            "online": data.get("online"),
+            "external_ip": data.get("external_ip"),
+            "active_devices": data.get("active_devices"),
+        }, now)
+        self.publish_dect(data.get("dect", []), now)
+
+    def publish_dect(self, devices, now=None):
+        """Veröffentlicht jedes DECT-Gerät unter dect/<AIN>."""
+        for device in devices:
+            if device.get("ain"):
+                self.publish(f"dect/{device['ain']}", device, now)
+
+    def publish_wan_status(self, status, external_ip, now=None):
+        """Veröffentlicht den Status der schnellen WAN-Prüfung unter wan/status."""
+        self.publish("wan/status", {"status": status, "external_ip": external_ip}, now)
+
+    def publish_speedtest(self, result, now=None):
+        if result:
+            self.publish("speedtest", result, now)
+
+    def publish_weather(self, weather, now=None):
+        if weather:
+            self.publish("weather", weather, now)
+
+
+def _create_client():
+    """Erzeugt einen paho-Client mit Last Will und automatischem Wiederverbinden."""
+    if hasattr(mqtt, "CallbackAPIVersion"):
+        client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=MQTT_CLIENT_ID)
+    else:
+        client = mqtt.Client(client_id=MQTT_CLIENT_ID)
+    if MQTT_USER:
+        client.username_pw_set(MQTT_USER, MQTT_PASSWORD)
+    availability = f"{MQTT_TOPIC_PREFIX}/available"
+    client.will_set(availability, "offline", qos=MQTT_QOS, retain=True)
+    # Nach jedem (Wieder-)Verbinden den Last Will überschreiben
+    client.on_connect = lambda *args: client.publish(availability, "online", qos=MQTT_QOS, retain=True)
+    client.connect_async(MQTT_HOST, MQTT_PORT, keepalive=60)
+    client.loop_start()
+    return client
+
+
+def start_mqtt_publisher():
+    """Startet die MQTT-Ausgabe, sofern MQTT_HOST gesetzt und paho-mqtt installiert ist."""
+    if not MQTT_HOST:
+        return None
+    if mqtt is None:
+        logger.error("MQTT_HOST ist gesetzt, aber paho-mqtt ist nicht installiert – MQTT deaktiviert.")
+        return None
+    publisher = MqttPublisher(_create_client()).start()
+    logger.info("MQTT-Ausgabe gestartet (%s:%s, Präfix '%s', QoS %s).", MQTT_HOST, MQTT_PORT, MQTT_TOPIC_PREFIX, MQTT_QOS)
+    return publisher
@@ -0,0 +1,248 @@
+"""
+Read API Module
+
+Kleine, schreibgeschützte HTTP-API für Dashboards. Liefert aktuellen Status,
+Energie-/Kostenzusammenfassungen pro Gerät und Zeitreihen aus einem
+In-Memory-Cache (LRU + TTL), damit viele offene Dashboards nicht jeweils
+eigene Abfragen gegen die Produktionstabellen auslösen.
+
+Der Cache wird verworfen, sobald der Collector neue Messwerte geschrieben hat
+(invalidate_cache). Gleichzeitige identische Anfragen werden zusammengefasst:
+nur die erste führt die Abfrage aus, alle anderen warten auf deren Ergebnis.
+
+Endpunkte:
+    GET /api/status
+    GET /api/energy?hours=24
+    GET /api/series?ain=<AIN>&field=multimeter_power&hours=24&bucket=300
+"""
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from decimal import Decimal
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import mysql.connector
+from electricity_price import get_current_electricity_price, calculate_energy_cost_wh
+
+logger = logging.getLogger(__name__)
+
+READ_API_PORT = int(os.getenv("READ_API_PORT", "0"))  # 0 = deaktiviert
+READ_API_CACHE_TTL = int(os.getenv("READ_API_CACHE_TTL", "60"))
+READ_API_CACHE_SIZE = int(os.getenv("READ_API_CACHE_SIZE", "256"))
+
+# Spalten, die als Zeitreihe abgefragt werden dürfen
+SERIES_FIELDS = (
+    "multimeter_power",
+    "temperature_celsius",
+    "state",
+    "hkr_is_temperature",
+    "hkr_set_temperature",
+)
+
+# SQL-Konfiguration (wird von fritzbox_collector.py übernommen)
+SQL_CONFIG = {
+    "user": os.getenv("SQL_USER", "sqluser"),
+    "password": os.getenv("SQL_PASSWORD", "sqlpass"),
+    "host": os.getenv("SQL_HOST", "sqlhost"),
+    "database": os.getenv("SQL_DB", "sqldb"),
+    "autocommit": True
+}
+
+
+class QueryCache:
+    """LRU-Cache mit TTL, Generationszähler zur Invalidierung und Zusammenfassung paralleler Abfragen."""
+
+    def __init__(self, max_entries=256, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.generation = 0
+        self._entries = OrderedDict()  # key -> (value, expires_at, generation)
+        self._inflight = {}  # key -> threading.Event
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self):
+        """Markiert alle Einträge als veraltet (z. B. nachdem neue Messwerte geschrieben wurden)."""
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def get_or_load(self, key, loader):
+        """
+        Liefert den gecachten Wert oder lädt ihn genau einmal über loader().
+
+        Args:
+            key: Hashbarer Cache-Schlüssel
+            loader (callable): Funktion ohne Argumente, die den Wert berechnet
+
+        Returns:
+            Der (ggf. frisch geladene) Wert
+        """
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry and entry[1] > time.monotonic() and entry[2] == self.generation:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                waiter = self._inflight.get(key)
+                if waiter is None:
+                    waiter = threading.Event()
+                    self._inflight[key] = waiter
+                    generation = self.generation
+                    self.misses += 1
+                    break
+            # Eine identische Abfrage läuft bereits - auf deren Ergebnis warten
+            waiter.wait()
+
+        try:
+            value = loader()
+            with self._lock:
+                if generation == self.generation:
+                    self._entries[key] = (value, time.monotonic() + self.ttl, generation)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            waiter.set()
+
+
+_cache = QueryCache(READ_API_CACHE_SIZE, READ_API_CACHE_TTL)
+
+
+def invalidate_cache():
+    """Wird vom Collector nach erfolgreichem Schreiben neuer Messwerte aufgerufen."""
+    _cache.invalidate()
+
+
+def _query(sql, params=()):
+    conn = mysql.connector.connect(**SQL_CONFIG)
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+        cursor.close()
+        return rows
+    finally:
+        conn.close()
+
+
+def load_status():
+    """Aktueller FritzBox-Status und letzter Messwert pro DECT-Gerät."""
+    status = _query("SELECT online, external_ip, active_devices, time FROM fritzbox_status ORDER BY id DESC LIMIT 1")
+    devices = _query(
+        """
+        SELECT d.ain, d.device_name, d.product_name, d.state, d.multimeter_power,
+               d.temperature_celsius, d.hkr_is_temperature, d.hkr_set_temperature, d.time
+        FROM dect200_data d
+        JOIN (SELECT ain, MAX(id) AS max_id FROM dect200_data
+              WHERE time >= NOW() - INTERVAL 1 DAY GROUP BY ain) latest
+          ON d.id = latest.max_id
+        ORDER BY d.ain
+        """
+    )
+    return {"fritzbox": status[0] if status else None, "dect": devices}
+
+
+def load_energy(hours):
+    """Energie- und Kostensumme pro Gerät über die letzten `hours` Stunden."""
+    price = get_current_electricity_price()
+    rows = _query(
+        """
+        SELECT ain, MAX(device_name) AS device_name, COUNT(*) AS samples,
+               AVG(multimeter_power) AS avg_power_mw,
+               SUM(COALESCE(energy_wh / 1000.0, (multimeter_power / 1000000.0) * (300 / 3600.0))) AS energy_kwh
+        FROM dect200_data
+        WHERE time >= NOW() - INTERVAL %s HOUR AND (energy_wh IS NOT NULL OR multimeter_power IS NOT NULL)
+        GROUP BY ain
+        ORDER BY ain
+        """,
+        (hours,)
+    )
+    for row in rows:
+        row["cost_eur"] = calculate_energy_cost_wh(float(row["energy_kwh"] or 0) * 1000, price)
+    return {"hours": hours, "price_eur_per_kwh": price, "devices": rows}
+
+
+def load_series(ain, field, hours, bucket):
+    """Zeitreihe eines Feldes für ein Gerät, gemittelt auf `bucket` Sekunden."""
+    if field not in SERIES_FIELDS:
+        raise ValueError(f"Feld nicht erlaubt: {field}")
+    rows = _query(
+        f"""
+        SELECT FROM_UNIXTIME(FLOOR(UNIX_TIMESTAMP(time) / %s) * %s) AS time, AVG({field}) AS value
+        FROM dect200_data
+        WHERE ain = %s AND time >= NOW() - INTERVAL %s HOUR
+        GROUP BY 1
+        ORDER BY 1
+        """,
+        (bucket, bucket, ain, hours)
+    )
+    return {"ain": ain, "field": field, "bucket": bucket, "points": rows}
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+class ReadApiHandler(BaseHTTPRequestHandler):
+    """HTTP-Handler für die Read-API (nur GET)."""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        try:
+            hours = int(params.get("hours", "24"))
+            if url.path == "/api/status":
+                key, loader = ("status",), load_status
+            elif url.path == "/api/energy":
+                key, loader = ("energy", hours), lambda: load_energy(hours)
+            elif url.path == "/api/series":
+                ain = params["ain"].replace(" ", "")
+                field = params.get("field", "multimeter_power")
+                bucket = max(int(params.get("bucket", "300")), 1)
+                key, loader = ("series", ain, field, hours, bucket), lambda: load_series(ain, field, hours, bucket)
+            else:
+                self._send(404, {"error": "Unbekannter Endpunkt"})
+                return
+            self._send(200, _cache.get_or_load(key, loader))
+        except (KeyError, ValueError) as e:
+            self._send(400, {"error": f"Ungültige Anfrage: {e}"})
+        except Exception as e:
+            logger.error("Read-API Fehler bei %s: %s", self.path, e)
+            self._send(500, {"error": "Interner Fehler"})
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, default=_json_default).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("Read-API: " + format, *args)
+
+
+def start_read_api():
+    """Startet die Read-API im Hintergrund, sofern READ_API_PORT gesetzt ist."""
+    if READ_API_PORT <= 0:
+        return None
+    server = ThreadingHTTPServer(("0.0.0.0", READ_API_PORT), ReadApiHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="read-api", daemon=True)
+    thread.start()
+    logger.info("Read-API gestartet auf Port %s (Cache-TTL %s s).", READ_API_PORT, READ_API_CACHE_TTL)
+    return server
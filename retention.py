@@ -0,0 +1,457 @@
+"""
+Retention Module
+
+Verdichtet die Rohdaten stündlich in *_hourly-Tabellen und löscht danach
+Rohdaten, die älter als die konfigurierte Aufbewahrungsdauer sind.
+
+Gelöscht wird nur, was bereits verdichtet wurde (Wasserstand in rollup_state).
+Nachträglich eingefügte Zeilen mit älterem Zeitstempel (z. B. aus bulk_import)
+werden über die höchste bereits verdichtete ID erkannt und ihre Stunden vor dem
+Löschen neu verdichtet.
+Statt eines großen DELETE wird in kleinen, über den Primärschlüssel begrenzten
+Blöcken mit Pausen gelöscht, damit write_to_sql nicht blockiert. Ist eine
+Tabelle nach Zeit partitioniert (RANGE COLUMNS(time) oder RANGE(TO_DAYS(time))),
+werden vollständig abgelaufene Partitionen stattdessen komplett entfernt.
+
+Konfiguration:
+    RETENTION_DAYS=dect200_data=90,fritzbox_status=90,weather_data=365,speedtest_results=365
+"""
+import os
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+import mysql.connector
+from notify import notify_all
+
+logger = logging.getLogger(__name__)
+
+RETENTION_INTERVAL = int(os.getenv("RETENTION_INTERVAL", "3600"))
+RETENTION_CHUNK_SIZE = int(os.getenv("RETENTION_CHUNK_SIZE", "5000"))
+RETENTION_CHUNK_PAUSE = float(os.getenv("RETENTION_CHUNK_PAUSE", "0.5"))
+
+
+def _parse_policies(raw):
+    policies = {}
+    for item in raw.split(","):
+        if "=" not in item:
+            continue
+        table, days = item.split("=", 1)
+        try:
+            if int(days) > 0:
+                policies[table.strip()] = int(days)
+        except ValueError:
+            logger.warning("Ungültige Aufbewahrungsdauer ignoriert: %s", item)
+    return policies
+
+
+# Aufbewahrungsdauer der Rohdaten in Tagen pro Tabelle (leer = nichts löschen)
+RETENTION_POLICIES = _parse_policies(os.getenv("RETENTION_DAYS", ""))
+
+# SQL-Konfiguration (wird von fritzbox_collector.py übernommen)
+SQL_CONFIG = {
+    "user": os.getenv("SQL_USER", "sqluser"),
+    "password": os.getenv("SQL_PASSWORD", "sqlpass"),
+    "host": os.getenv("SQL_HOST", "sqlhost"),
+    "database": os.getenv("SQL_DB", "sqldb"),
+    "autocommit": True
+}
+
+# Stündliche Verdichtung je Rohdatentabelle: Zieltabelle, DDL und Aggregations-SELECT
+# (Platzhalter: Start- und Endzeitpunkt des zu verdichtenden Bereichs)
+ROLLUPS = {
+    "dect200_data": {
+        "table": "dect200_hourly",
+        "ddl": """CREATE TABLE IF NOT EXISTS dect200_hourly (
+            ain VARCHAR(32) NOT NULL,
+            hour DATETIME NOT NULL,
+            samples INT,
+            avg_power_mw FLOAT,
+            max_power_mw INT,
+            energy_kwh DOUBLE,
+            avg_temperature_celsius FLOAT,
+            avg_hkr_is_temperature FLOAT,
+            avg_hkr_set_temperature FLOAT,
+            PRIMARY KEY (ain, hour)
+        )""",
+        "select": """
+            SELECT ain, DATE_FORMAT(time, '%Y-%m-%d %H:00:00'), COUNT(*), AVG(multimeter_power),
+                   MAX(multimeter_power),
+                   SUM(COALESCE(energy_wh / 1000.0, (multimeter_power / 1000000.0) * (300 / 3600.0))),
+                   AVG(temperature_celsius), AVG(hkr_is_temperature), AVG(hkr_set_temperature)
+            FROM dect200_data
+            WHERE time >= %s AND time < %s AND ain IS NOT NULL
+            GROUP BY 1, 2
+        """,
+        "columns": ("ain", "hour", "samples", "avg_power_mw", "max_power_mw", "energy_kwh",
+                    "avg_temperature_celsius", "avg_hkr_is_temperature", "avg_hkr_set_temperature"),
+    },
+    "fritzbox_status": {
+        "table": "fritzbox_status_hourly",
+        "ddl": """CREATE TABLE IF NOT EXISTS fritzbox_status_hourly (
+            hour DATETIME NOT NULL PRIMARY KEY,
+            samples INT,
+            connected_samples INT,
+            avg_active_devices FLOAT,
+            max_active_devices INT
+        )""",
+        "select": """
+            SELECT DATE_FORMAT(time, '%Y-%m-%d %H:00:00'), COUNT(*), SUM(online = 'Connected'),
+                   AVG(active_devices), MAX(active_devices)
+            FROM fritzbox_status
+            WHERE time >= %s AND time < %s
+            GROUP BY 1
+        """,
+        "columns": ("hour", "samples", "connected_samples", "avg_active_devices", "max_active_devices"),
+    },
+    "weather_data": {
+        "table": "weather_hourly",
+        "ddl": """CREATE TABLE IF NOT EXISTS weather_hourly (
+            location VARCHAR(128) NOT NULL,
+            hour DATETIME NOT NULL,
+            samples INT,
+            avg_temperature_celsius FLOAT,
+            min_temperature_celsius FLOAT,
+            max_temperature_celsius FLOAT,
+            avg_humidity FLOAT,
+            avg_pressure FLOAT,
+            avg_wind_speed FLOAT,
+            PRIMARY KEY (location, hour)
+        )""",
+        "select": """
+            SELECT location, DATE_FORMAT(time, '%Y-%m-%d %H:00:00'), COUNT(*), AVG(temperature_celsius),
+                   MIN(temperature_celsius), MAX(temperature_celsius), AVG(humidity), AVG(pressure), AVG(wind_speed)
+            FROM weather_data
+            WHERE time >= %s AND time < %s AND location IS NOT NULL
+            GROUP BY 1, 2
+        """,
+        "columns": ("location", "hour", "samples", "avg_temperature_celsius", "min_temperature_celsius",
+                    "max_temperature_celsius", "avg_humidity", "avg_pressure", "avg_wind_speed"),
+    },
+    "speedtest_results": {
+        "table": "speedtest_hourly",
+        "ddl": """CREATE TABLE IF NOT EXISTS speedtest_hourly (
+            hour DATETIME NOT NULL PRIMARY KEY,
+            samples INT,
+            avg_ping_ms FLOAT,
+            avg_download_mbps FLOAT,
+            min_download_mbps FLOAT,
+            avg_upload_mbps FLOAT,
+            min_upload_mbps FLOAT
+        )""",
+        "select": """
+            SELECT DATE_FORMAT(time, '%Y-%m-%d %H:00:00'), COUNT(*), AVG(ping_ms), AVG(download_mbps),
+                   MIN(download_mbps), AVG(upload_mbps), MIN(upload_mbps)
+            FROM speedtest_results
+            WHERE time >= %s AND time < %s
+            GROUP BY 1
+        """,
+        "columns": ("hour", "samples", "avg_ping_ms", "avg_download_mbps", "min_download_mbps",
+                    "avg_upload_mbps", "min_upload_mbps"),
+    },
+}
+
+
+def create_rollup_tables():
+    """Erstellt die Verdichtungstabellen und die Wasserstandstabelle, falls sie nicht existieren."""
+    logger.info("Prüfe und erstelle ggf. Verdichtungstabellen...")
+    try:
+        conn = mysql.connector.connect(**SQL_CONFIG)
+        cursor = conn.cursor()
+        cursor.execute("""CREATE TABLE IF NOT EXISTS rollup_state (
+            table_name VARCHAR(64) PRIMARY KEY,
+            rolled_up_until DATETIME NOT NULL,
+            rolled_up_id BIGINT,
+            purged_until DATETIME,
+            time DATETIME
+        )""")
+        # Ältere Installationen: fehlende Spalten ergänzen
+        cursor.execute("""
+            SELECT COLUMN_NAME
+            FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = %s AND TABLE_NAME = 'rollup_state'
+        """, (SQL_CONFIG["database"],))
+        existing = {row[0] for row in cursor.fetchall()}
+        for col, coltype in (("rolled_up_id", "BIGINT"), ("purged_until", "DATETIME")):
+            if col not in existing:
+                cursor.execute(f"ALTER TABLE rollup_state ADD COLUMN {col} {coltype} NULL")
+                logger.info("Spalte ergänzt: rollup_state.%s %s", col, coltype)
+        for rollup in ROLLUPS.values():
+            cursor.execute(rollup["ddl"])
+        cursor.close()
+        conn.close()
+        logger.info("Verdichtungstabellen wurden geprüft/erstellt.")
+    except Exception as e:
+        logger.error("Fehler bei Verdichtungstabellen-Prüfung/-Erstellung: %s", e)
+        notify_all(f"Verdichtungstabellen konnten nicht angelegt werden: {e}")
+        raise
+
+
+def _rolled_up_until(cursor, table):
+    cursor.execute("SELECT rolled_up_until FROM rollup_state WHERE table_name = %s", (table,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _rollup_updates(columns):
+    return ", ".join(f"{c} = VALUES({c})" for c in columns if c not in ("ain", "location", "hour"))
+
+
+def rollup_late_rows(cursor, table, max_id):
+    """
+    Verdichtet Stunden neu, in die seit dem letzten Lauf Zeilen vor dem Wasserstand eingefügt wurden.
+
+    Erkannt werden solche Zeilen an einer ID oberhalb von rolled_up_id. Stunden, deren
+    Rohdaten noch vollständig vorhanden sind, werden komplett neu berechnet. Für bereits
+    gelöschte Stunden (vor purged_until) wird nur eine fehlende Stundenzeile angelegt;
+    eine vorhandene bleibt unverändert, weil die ursprünglichen Rohdaten fehlen.
+
+    Args:
+        max_id (int): Höchste ID zu Beginn des Laufs; spätere Zeilen prüft der nächste Lauf
+
+    Returns:
+        int: Anzahl neu verdichteter Stunden
+    """
+    cursor.execute(
+        "SELECT rolled_up_until, rolled_up_id, purged_until FROM rollup_state WHERE table_name = %s",
+        (table,)
+    )
+    state = cursor.fetchone()
+    if state is None or state[1] is None or max_id is None:
+        return 0
+    watermark, last_id, purged_until = state
+    cursor.execute(
+        f"SELECT DISTINCT DATE_FORMAT(time, '%Y-%m-%d %H:00:00') FROM {table} "
+        f"WHERE id > %s AND id <= %s AND time < %s",
+        (last_id, max_id, watermark)
+    )
+    hours = sorted(datetime.fromisoformat(str(row[0])) for row in cursor.fetchall() if row[0])
+    rollup = ROLLUPS[table]
+    columns = rollup["columns"]
+    skipped = 0
+    for hour in hours:
+        if purged_until is not None and hour < purged_until:
+            sql = f"INSERT IGNORE INTO {rollup['table']} ({', '.join(columns)}) {rollup['select']}"
+            skipped += 1
+        else:
+            sql = (
+                f"INSERT INTO {rollup['table']} ({', '.join(columns)}) {rollup['select']} "
+                f"ON DUPLICATE KEY UPDATE {_rollup_updates(columns)}"
+            )
+        cursor.execute(sql, (hour, hour + timedelta(hours=1)))
+    if hours:
+        logger.info("Verdichtung %s: %s Stunde(n) mit nachträglich eingefügten Zeilen neu berechnet.", table, len(hours))
+    if skipped:
+        logger.warning(
+            "Verdichtung %s: %s Stunde(n) vor %s waren bereits gelöscht – vorhandene Stundenwerte bleiben unverändert.",
+            table, skipped, purged_until
+        )
+    return len(hours)
+
+
+def rollup_table(cursor, table, until):
+    """
+    Verdichtet alle vollständigen Stunden seit dem letzten Wasserstand bis `until`.
+
+    Returns:
+        datetime: Neuer Wasserstand (alles davor ist verdichtet)
+    """
+    rollup = ROLLUPS[table]
+    until = until.replace(minute=0, second=0, microsecond=0)
+    start = _rolled_up_until(cursor, table)
+    if start is None:
+        cursor.execute(f"SELECT MIN(time) FROM {table}")
+        first = cursor.fetchone()[0]
+        if first is None:
+            return None
+        start = first.replace(minute=0, second=0, microsecond=0)
+    if start >= until:
+        return start
+
+    columns = rollup["columns"]
+    updates = _rollup_updates(columns)
+    # Tageweise verdichten, damit einzelne Abfragen kurz bleiben
+    chunk_start = start
+    while chunk_start < until:
+        chunk_end = min(chunk_start + timedelta(days=1), until)
+        cursor.execute(
+            f"INSERT INTO {rollup['table']} ({', '.join(columns)}) {rollup['select']} "
+            f"ON DUPLICATE KEY UPDATE {updates}",
+            (chunk_start, chunk_end)
+        )
+        cursor.execute(
+            """
+            INSERT INTO rollup_state (table_name, rolled_up_until, time) VALUES (%s, %s, NOW())
+            ON DUPLICATE KEY UPDATE rolled_up_until = VALUES(rolled_up_until), time = NOW()
+            """,
+            (table, chunk_end)
+        )
+        chunk_start = chunk_end
+    return until
+
+
+def _partition_bound(method, expression, description):
+    """Obere Grenze einer Zeit-Partition als datetime oder None, falls nicht auswertbar."""
+    if not description or description == "MAXVALUE":
+        return None
+    if method == "RANGE COLUMNS" and expression.strip("`") == "time":
+        value = description.strip("'")
+        return datetime.fromisoformat(value[:19]) if " " in value else datetime.fromisoformat(value)
+    if method == "RANGE" and expression.replace("`", "").lower() == "to_days(time)":
+        # MySQL: TO_DAYS(d) = d.toordinal() + 365
+        return datetime.fromordinal(int(description) - 365)
+    return None
+
+
+def drop_expired_partitions(cursor, table, cutoff):
+    """
+    Entfernt Partitionen, deren obere Grenze vor `cutoff` liegt.
+
+    Returns:
+        tuple: (True falls die Tabelle passend partitioniert ist, Anzahl entfernter Zeilen)
+    """
+    cursor.execute(
+        """
+        SELECT PARTITION_NAME, PARTITION_METHOD, PARTITION_EXPRESSION, PARTITION_DESCRIPTION, TABLE_ROWS
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+        """,
+        (SQL_CONFIG["database"], table)
+    )
+    partitions = cursor.fetchall()
+    if not partitions:
+        return False, 0
+    removed = 0
+    for name, method, expression, description, rows in partitions:
+        bound = _partition_bound(method, expression or "", description)
+        if bound is None:
+            if method not in ("RANGE", "RANGE COLUMNS"):
+                return False, 0
+            continue
+        if bound <= cutoff:
+            cursor.execute(f"ALTER TABLE {table} DROP PARTITION {name}")
+            removed += rows or 0
+            logger.info("Partition %s.%s (bis %s) entfernt.", table, name, bound)
+    return True, removed
+
+
+def purge_chunked(cursor, table, cutoff, chunk_size=RETENTION_CHUNK_SIZE, pause=RETENTION_CHUNK_PAUSE):
+    """
+    Löscht Zeilen mit time < cutoff in kleinen Primärschlüssel-Bereichen.
+
+    Zuerst werden die ältesten IDs blockweise abgearbeitet. Nachträglich eingefügte
+    Zeilen (hohe ID, alter Zeitstempel) liegen hinter den noch gültigen Zeilen und
+    werden danach über begrenzte DELETEs oberhalb der zuletzt bearbeiteten ID entfernt.
+
+    Returns:
+        int: Anzahl gelöschter Zeilen
+    """
+    removed = 0
+    last_id = 0
+    while True:
+        cursor.execute(f"SELECT id, time FROM {table} WHERE id > %s ORDER BY id LIMIT %s", (last_id, chunk_size))
+        rows = cursor.fetchall()
+        expired = [row_id for row_id, row_time in rows if row_time is not None and row_time < cutoff]
+        if not expired:
+            # Die IDs steigen mit der Zeit - im ersten Block ohne abgelaufene Zeilen ist Schluss
+            break
+        upper = max(expired)
+        cursor.execute(
+            f"DELETE FROM {table} WHERE id > %s AND id <= %s AND time < %s",
+            (last_id, upper, cutoff)
+        )
+        removed += cursor.rowcount
+        last_id = upper
+        if pause:
+            time.sleep(pause)
+    while True:
+        cursor.execute(
+            f"DELETE FROM {table} WHERE id > %s AND time < %s ORDER BY id LIMIT %s",
+            (last_id, cutoff, chunk_size)
+        )
+        removed += cursor.rowcount
+        if cursor.rowcount < chunk_size:
+            break
+        if pause:
+            time.sleep(pause)
+    return removed
+
+
+def run_retention(now=None):
+    """
+    Verdichtet und bereinigt alle Tabellen mit Aufbewahrungsrichtlinie.
+
+    Returns:
+        dict: Tabelle -> {"removed": Zeilen, "seconds": Dauer, "method": "partition"/"chunked"}
+    """
+    report = {}
+    conn = mysql.connector.connect(**SQL_CONFIG)
+    try:
+        cursor = conn.cursor()
+        if now is None:
+            # Zeitstempel der Rohdaten stammen von NOW() in MySQL - gleiche Uhr und Zeitzone verwenden
+            cursor.execute("SELECT NOW()")
+            now = cursor.fetchone()[0]
+        for table, days in RETENTION_POLICIES.items():
+            if table not in ROLLUPS:
+                logger.warning("Keine Verdichtung für %s definiert - Tabelle wird nicht bereinigt.", table)
+                continue
+            started = time.monotonic()
+            cursor.execute(f"SELECT MAX(id) FROM {table}")
+            max_id = cursor.fetchone()[0]
+            rollup_late_rows(cursor, table, max_id)
+            watermark = rollup_table(cursor, table, now)
+            if watermark is None:
+                continue
+            cursor.execute(
+                "UPDATE rollup_state SET rolled_up_id = %s WHERE table_name = %s", (max_id, table)
+            )
+            # Nur ganze Stunden löschen, die älter als die Aufbewahrung UND bereits verdichtet sind
+            cutoff = min((now - timedelta(days=days)).replace(minute=0, second=0, microsecond=0), watermark)
+            partitioned, removed = drop_expired_partitions(cursor, table, cutoff)
+            if not partitioned:
+                removed = purge_chunked(cursor, table, cutoff)
+            cursor.execute(
+                "UPDATE rollup_state SET purged_until = GREATEST(COALESCE(purged_until, %s), %s) "
+                "WHERE table_name = %s",
+                (cutoff, cutoff, table)
+            )
+            seconds = time.monotonic() - started
+            report[table] = {
+                "removed": removed,
+                "seconds": seconds,
+                "method": "partition" if partitioned else "chunked",
+            }
+            logger.info(
+                "Retention %s: %s Zeilen vor %s entfernt (%s) in %.1f s",
+                table, removed, cutoff, report[table]["method"], seconds
+            )
+        cursor.close()
+    finally:
+        conn.close()
+    return report
+
+
+def _retention_loop(should_run):
+    while True:
+        if should_run is None or should_run():
+            try:
+                run_retention()
+            except Exception as e:
+                logger.error("Fehler bei Verdichtung/Bereinigung: %s", e)
+                notify_all(f"Fehler bei Verdichtung/Bereinigung: {e}")
+        time.sleep(RETENTION_INTERVAL)
+
+
+def start_retention(should_run=None):
+    """Startet Verdichtung und Bereinigung im Hintergrund, sofern RETENTION_DAYS gesetzt ist."""
+    if not RETENTION_POLICIES:
+        return None
+    thread = threading.Thread(target=_retention_loop, args=(should_run,), name="retention", daemon=True)
+    thread.start()
+    logger.info(
+        "Retention aktiv (alle %s s): %s", RETENTION_INTERVAL,
+        ", ".join(f"{t}={d} Tage" for t, d in RETENTION_POLICIES.items())
+    )
+    return thread
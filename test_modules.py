@@ -131,6 +131,699 @@ try:
 except Exception as e:
     print(f"✗ Error in realistic cost calculation: {e}")
 
+# Test 7: WAN traffic counter deltas (wrap and reset)
+print("\n[Test 7] Testing WAN traffic counter deltas...")
+try:
+    from wan_traffic_collector import counter_delta, WanTrafficAggregator, COUNTER_32BIT_MAX
+
+    checks = [
+        (counter_delta(1000, 1500), (500, False), "normal increase"),
+        (counter_delta(COUNTER_32BIT_MAX - 100, 50), (150, False), "32-bit wrap"),
+        (counter_delta(5_000_000, 1000), (1000, True), "reset after reboot"),
+        (counter_delta(2 ** 40, 10, wraps_at=None), (10, True), "64-bit counter reset"),
+        (counter_delta(2 ** 40, 123456, COUNTER_32BIT_MAX), (123456, True), "previous above 32-bit range is no wrap"),
+    ]
+    for result, expected, label in checks:
+        if result == expected:
+            print(f"✓ {label}: {result}")
+        else:
+            print(f"✗ {label}: got {result}, expected {expected}")
+
+    aggregator = WanTrafficAggregator()
+    aggregator.interval_start = 0
+    aggregator.add_sample({"received": 0, "sent": 0, "wraps_at": None}, 0)
+    aggregator.add_sample({"received": 10_000, "sent": 1_000, "wraps_at": None}, 10)
+    aggregator.add_sample({"received": 40_000, "sent": 2_000, "wraps_at": None}, 20)
+    record = aggregator.flush(20)
+    if (record["bytes_down"], record["bytes_up"], record["peak_down_rate"], record["samples"]) == (40_000, 2_000, 3000.0, 2):
+        print(f"✓ Aggregated interval: {record['bytes_down']} B down, peak {record['peak_down_rate']} B/s")
+    else:
+        print(f"✗ Unexpected aggregated interval: {record}")
+
+    from fritzconnection.core.exceptions import FritzServiceError
+    from wan_traffic_collector import read_traffic_counters
+
+    class FakeWanBox:
+        """Bildet die echte Aufteilung ab: 64-Bit-Zähler nur über den IGD-Service WANCommonIFC1."""
+
+        def __init__(self, igd=True):
+            self.igd = igd
+
+        def call_action(self, service, action, **kwargs):
+            if service == "WANCommonIFC1" and action == "GetAddonInfos" and self.igd:
+                return {"NewX_AVM_DE_TotalBytesReceived64": 2 ** 40, "NewX_AVM_DE_TotalBytesSent64": 2 ** 33}
+            if service == "WANCommonInterfaceConfig" and action == "GetTotalBytesReceived":
+                return {"NewTotalBytesReceived": 123456}
+            if service == "WANCommonInterfaceConfig" and action == "GetTotalBytesSent":
+                return {"NewTotalBytesSent": 6543}
+            if service == "WANCommonInterfaceConfig" and action == "X_AVM-DE_GetOnlineMonitor":
+                return {"Newds_current_bps": "100,300,200", "Newus_current_bps": "10,20"}
+            raise FritzServiceError(f"{service}.{action} nicht vorhanden")
+
+    wide = read_traffic_counters(FakeWanBox())
+    narrow = read_traffic_counters(FakeWanBox(igd=False))
+    if (wide["received"], wide["wraps_at"], wide["monitor_down"]) == (2 ** 40, None, 300) and \
+            (narrow["received"], narrow["sent"], narrow["wraps_at"]) == (123456, 6543, COUNTER_32BIT_MAX):
+        print("✓ 64-bit counters read from WANCommonIFC1, 32-bit fallback from WANCommonInterfaceConfig")
+    else:
+        print(f"✗ Unexpected counter source: {wide}, {narrow}")
+
+    # Einzelne Abtastung fällt auf 32 Bit zurück: keine Differenz über den Quellenwechsel
+    aggregator = WanTrafficAggregator()
+    aggregator.interval_start = 0
+    for now, box in enumerate((FakeWanBox(), FakeWanBox(igd=False), FakeWanBox(), FakeWanBox())):
+        aggregator.add_sample(dict(read_traffic_counters(box), monitor_down=None, monitor_up=None), now * 10)
+    record = aggregator.flush(30)
+    if (record["bytes_down"], record["peak_down_rate"], record["counter_resets"]) == (0, 0.0, 0):
+        print("✓ Counter source switch re-baselines instead of producing bogus deltas")
+    else:
+        print(f"✗ Unexpected interval across counter source switch: {record}")
+except Exception as e:
+    print(f"✗ Error in WAN traffic delta calculation: {e}")
+
+# Test 8: Bulk import row validation
+print("\n[Test 8] Testing bulk import row validation...")
+try:
+    from bulk_import import validate_row
+
+    row = validate_row("dect200_data", {"ain": "11630 0123456", "power": "2500", "time": "2024-01-01T12:00:00"})
+    if row[0] == "116300123456" and row[2] == 2500 and row[-1].hour == 12:
+        print("✓ Valid DECT row normalized (AIN compacted, types converted)")
+    else:
+        print(f"✗ Unexpected normalized row: {row}")
+
+    try:
+        validate_row("dect200_data", {"power": "2500", "time": "2024-01-01 12:00:00"})
+        print("✗ Row without AIN was accepted")
+    except ValueError:
+        print("✓ Row without AIN rejected")
+
+    from bulk_import import decode_row, _dedup_chunk
+    bad_lines = ['{"ain": "1", "time": ', '[1, 2, 3]', '{"ain": "1", "power": "inf", "time": "2024-01-01 12:00:00"}']
+    rejected = 0
+    for line in bad_lines:
+        try:
+            validate_row("dect200_data", decode_row(line))
+        except ValueError:
+            rejected += 1
+    if rejected == len(bad_lines):
+        print("✓ Malformed JSON, non-object line and infinite value counted as invalid rows")
+    else:
+        print(f"✗ Only {rejected} of {len(bad_lines)} malformed lines rejected as ValueError")
+
+    first = validate_row("dect200_data", {"ain": "1", "power": "10", "time": "2024-01-01 12:00:00"})
+    second = validate_row("dect200_data", {"ain": "1", "power": "20", "time": "2024-01-01T12:00:00"})
+    if _dedup_chunk("dect200_data", [first, second]) == [first]:
+        print("✓ Rows sharing (ain, time) deduplicated within a chunk")
+    else:
+        print("✗ Duplicate key within a chunk not removed")
+except Exception as e:
+    print(f"✗ Error in bulk import validation: {e}")
+
+# Test 9: Read API cache (coalescing and invalidation)
+print("\n[Test 9] Testing read API cache...")
+try:
+    import threading
+    from read_api import QueryCache
+
+    cache = QueryCache(max_entries=2, ttl=60)
+    calls = []
+    release = threading.Event()
+
+    def slow_loader():
+        calls.append(1)
+        release.wait(2)
+        return {"value": len(calls)}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load("k", slow_loader))) for _ in range(10)]
+    for t in threads:
+        t.start()
+    release.set()
+    for t in threads:
+        t.join()
+    if len(calls) == 1 and len(results) == 10:
+        print("✓ 10 concurrent identical requests caused 1 load")
+    else:
+        print(f"✗ Expected 1 load for 10 requests, got {len(calls)}")
+
+    cache.invalidate()
+    cache.get_or_load("k", slow_loader)
+    if len(calls) == 2:
+        print("✓ Cache reloads after invalidation")
+    else:
+        print(f"✗ Cache did not reload after invalidation ({len(calls)} loads)")
+except Exception as e:
+    print(f"✗ Error in read API cache test: {e}")
+
+# Test 10: Adaptive polling intervals
+print("\n[Test 10] Testing adaptive polling scheduler...")
+try:
+    from adaptive_polling import AdaptivePollScheduler
+
+    scheduler = AdaptivePollScheduler(min_interval=30, max_interval=900)
+    thermostat = {"ain": "HKR1", "state": None, "switch_state": None, "multimeter_power": None,
+                  "temperature_celsius": 205, "hkr_is_temperature": 41, "hkr_set_temperature": 42}
+    now = 0.0
+    for _ in range(30):
+        now += scheduler.observe(dict(thermostat), now)
+    steady = scheduler.devices["HKR1"].interval
+    if steady > 600:
+        print(f"✓ Stable thermostat backs off to {steady:.0f} s")
+    else:
+        print(f"✗ Stable thermostat interval only {steady:.0f} s")
+
+    changed = scheduler.observe(dict(thermostat, hkr_set_temperature=44), now)
+    if changed == 30:
+        print("✓ Set temperature change falls back to minimum interval")
+    else:
+        print(f"✗ Interval after state change is {changed} s, expected 30 s")
+
+    delays = [scheduler.failed("HKR1", now) for _ in range(7)]
+    if delays[:3] == [30, 60, 120] and delays[-1] == 900 and "HKR1" in scheduler.devices:
+        print("✓ Failed poll keeps the device and backs off up to the maximum interval")
+    else:
+        print(f"✗ Unexpected retry delays after failed polls: {delays}")
+except Exception as e:
+    print(f"✗ Error in adaptive polling test: {e}")
+
+# Test 11: Cached DECT device map with targeted refresh
+print("\n[Test 11] Testing cached DECT device map...")
+try:
+    import tempfile
+    os.environ.setdefault("LOG_FILE", os.path.join(tempfile.gettempdir(), "fritzbox_collector_test.log"))
+    import fritzbox_collector as fcol
+
+    class FakeHomeauto:
+        def __init__(self, ains):
+            self.ains = ains
+            self.calls = []
+
+        def call_action(self, service, action, **kwargs):
+            self.calls.append(action)
+            if action == "GetGenericDeviceInfos":
+                if kwargs["NewIndex"] >= len(self.ains):
+                    raise Exception("SpecifiedArrayIndexInvalid errorCode: 713")
+                return {"NewAIN": self.ains[kwargs["NewIndex"]], "NewSwitchState": "ON"}
+            if action == "GetSpecificDeviceInfos":
+                if kwargs["NewAIN"] not in self.ains:
+                    raise Exception("Invalid AIN")
+                return {"NewSwitchState": "OFF"}
+            raise Exception(f"Unexpected action {action}")
+
+    box = FakeHomeauto(["11111 0000001", "11111 0000002", "11111 0000003"])
+    fcol.DECT_AINS_FILTER_SET = {"111110000002"}
+    first = fcol._collect_dect_devices(box, "X_AVM-DE_Homeauto1")
+    enumerate_calls = len(box.calls)
+    second = fcol._collect_dect_devices(box, "X_AVM-DE_Homeauto1")
+    targeted_calls = len(box.calls) - enumerate_calls
+    if [d["ain"] for d in first] == ["111110000002"] and targeted_calls == 1 and second[0]["state"] == 0:
+        print(f"✓ Full enumeration took {enumerate_calls} calls, filtered refresh took {targeted_calls}")
+    else:
+        print(f"✗ Unexpected device map behaviour: {first}, {second}, {box.calls}")
+
+    box.ains = ["11111 0000001", "11111 0000003", "11111 0000004"]
+    fcol._collect_dect_devices(box, "X_AVM-DE_Homeauto1")
+    if "111110000002" not in fcol._DEVICE_MAP and "111110000004" in fcol._DEVICE_MAP:
+        print("✓ Failed lookup triggered re-enumeration and updated the device map")
+    else:
+        print(f"✗ Device map not updated after failed lookup: {sorted(fcol._DEVICE_MAP)}")
+
+    calls_before = len(box.calls)
+    fcol._collect_dect_devices(box, "X_AVM-DE_Homeauto1", force=True)
+    if "GetGenericDeviceInfos" in box.calls[calls_before:]:
+        print("✓ Forced discovery enumerates although the device map is fresh")
+    else:
+        print(f"✗ Forced discovery only did targeted fetches: {box.calls[calls_before:]}")
+
+    class FlakyHomeauto(FakeHomeauto):
+        """Zeitüberschreitung bei einem einzelnen Index mitten in der Auflistung."""
+
+        def call_action(self, service, action, **kwargs):
+            if action == "GetGenericDeviceInfos" and kwargs["NewIndex"] == 2:
+                raise TimeoutError("read timed out")
+            return super().call_action(service, action, **kwargs)
+
+    flaky = FlakyHomeauto([f"1111{i} 0000001" for i in range(6)])
+    fcol.DECT_AINS_FILTER_SET = set()
+    fcol._collect_dect_devices(FakeHomeauto(flaky.ains), "X_AVM-DE_Homeauto1")
+    full_map = dict(fcol._DEVICE_MAP)
+    fcol._energy_counters.update("111150000001", 100, 0)
+    partial = fcol._collect_dect_devices(flaky, "X_AVM-DE_Homeauto1", force=True)
+    if (fcol._DEVICE_MAP == full_map and "111150000001" in fcol._energy_counters.counters
+            and [d["ain"] for d in partial] == [f"1111{i}0000001" for i in (0, 1, 3, 4, 5)]):
+        print("✓ Aborted enumeration keeps the device map and counters, returns the devices read")
+    else:
+        print(f"✗ Aborted enumeration treated as complete: {sorted(fcol._DEVICE_MAP)}, {partial}")
+    fcol._DEVICE_MAP.clear()
+    fcol._energy_counters.forget("111150000001")
+except Exception as e:
+    print(f"✗ Error in device map test: {e}")
+
+# Test 12: Consistent hashing for replica sharding
+print("\n[Test 12] Testing consistent hashing of collection targets...")
+try:
+    from coordination import HashRing
+
+    targets = [f"fritzbox-{i}" for i in range(200)]
+    before = HashRing(["replica-a", "replica-b", "replica-c"])
+    after = HashRing(["replica-a", "replica-b", "replica-c", "replica-d"])
+    moved = [t for t in targets if before.owner(t) != after.owner(t)]
+    if all(after.owner(t) == "replica-d" for t in moved) and len(moved) < len(targets) / 2:
+        print(f"✓ Joining replica moved {len(moved)} of {len(targets)} targets, all to the new replica")
+    else:
+        print(f"✗ Unexpected churn when a replica joins: {len(moved)} targets moved")
+except Exception as e:
+    print(f"✗ Error in consistent hashing test: {e}")
+
+# Test 13: Chunked retention purge
+print("\n[Test 13] Testing chunked retention purge...")
+try:
+    from datetime import datetime, timedelta
+    from retention import purge_chunked
+
+    class FakeTableCursor:
+        def __init__(self, rows):
+            self.rows = rows  # list of (id, time)
+            self.deletes = 0
+            self.rowcount = 0
+            self._result = []
+
+        def execute(self, sql, params):
+            if sql.startswith("SELECT"):
+                last_id, limit = params
+                self._result = [r for r in self.rows if r[0] > last_id][:limit]
+                return
+            if "LIMIT" in sql:
+                low, cutoff, limit = params
+                doomed = {r[0] for r in self.rows if r[0] > low and r[1] < cutoff}
+                doomed = set(sorted(doomed)[:limit])
+            else:
+                low, high, cutoff = params
+                doomed = {r[0] for r in self.rows if low < r[0] <= high and r[1] < cutoff}
+            self.rows = [r for r in self.rows if r[0] not in doomed]
+            self.rowcount = len(doomed)
+            self.deletes += 1
+
+        def fetchall(self):
+            return self._result
+
+    start = datetime(2024, 1, 1)
+    cursor = FakeTableCursor([(i, start + timedelta(minutes=5 * i)) for i in range(1, 1001)])
+    cutoff = start + timedelta(minutes=5 * 500, seconds=1)
+    removed = purge_chunked(cursor, "dect200_data", cutoff, chunk_size=100, pause=0)
+    if removed == 500 and cursor.deletes == 6 and cursor.rows[0][0] == 501:
+        print(f"✓ Removed {removed} rows in {cursor.deletes} primary-key chunks, newer rows kept")
+    else:
+        print(f"✗ Unexpected purge result: removed={removed}, deletes={cursor.deletes}")
+
+    # Nachträglich importierte alte Zeilen mit hohen IDs hinter den gültigen Zeilen
+    late = [(2000 + i, start + timedelta(minutes=i)) for i in range(250)]
+    cursor = FakeTableCursor([(i, start + timedelta(minutes=5 * i)) for i in range(1, 1001)] + late)
+    removed = purge_chunked(cursor, "dect200_data", cutoff, chunk_size=100, pause=0)
+    if removed == 750 and all(row_time >= cutoff for _, row_time in cursor.rows):
+        print(f"✓ Late rows with high ids purged as well ({removed} rows removed)")
+    else:
+        print(f"✗ Expired late rows kept: removed={removed}, remaining={len(cursor.rows)}")
+
+    from retention import rollup_late_rows
+
+    class FakeStateCursor:
+        """rollup_state mit Wasserstand 12:00, gelöscht bis 02:00; späte Zeilen um 01:xx und 10:xx."""
+        def __init__(self):
+            self.statements = []
+            self._result = []
+
+        def execute(self, sql, params=None):
+            self.statements.append((sql, params))
+            if "FROM rollup_state" in sql:
+                self._result = [(start.replace(hour=12), 1000, start.replace(hour=2))]
+            elif sql.startswith("SELECT DISTINCT"):
+                self._result = [("2024-01-01 10:00:00",), ("2024-01-01 01:00:00",)]
+
+        def fetchone(self):
+            return self._result[0]
+
+        def fetchall(self):
+            return self._result
+
+    cursor = FakeStateCursor()
+    touched = rollup_late_rows(cursor, "dect200_data", 1200)
+    inserts = [(sql, params) for sql, params in cursor.statements if "INTO dect200_hourly" in sql]
+    late_query = cursor.statements[1][1]
+    if (touched == 2 and late_query == (1000, 1200, start.replace(hour=12))
+            and inserts[0][0].startswith("INSERT IGNORE") and inserts[0][1][0] == start.replace(hour=1)
+            and "ON DUPLICATE KEY UPDATE" in inserts[1][0] and inserts[1][1][0] == start.replace(hour=10)):
+        print("✓ Late rows before the watermark re-roll their hours (purged hours only filled if missing)")
+    else:
+        print(f"✗ Unexpected late-row rollup: touched={touched}, statements={cursor.statements}")
+except Exception as e:
+    print(f"✗ Error in retention purge test: {e}")
+
+# Test 14: Short soak run of the main loop
+print("\n[Test 14] Testing soak harness (1 simulated day)...")
+try:
+    import logging
+    import soak_test
+    import fritzbox_collector as fcol
+
+    fcol.DECT_AINS_FILTER_SET = set()
+    fcol._DEVICE_MAP.clear()
+    logging.getLogger("fritzbox_collector").setLevel(logging.WARNING)
+    logging.getLogger("weather_collector").setLevel(logging.ERROR)
+    report = soak_test.run_soak(days=1, devices=4)
+    failures = soak_test.check_thresholds(report, max_rss_growth_kb=20_480, max_fd_growth=5, max_p95_ratio=5.0)
+    if report["cycles"] == 288 and report["tr064_calls"] > 0 and not failures:
+        print(f"✓ {report['cycles']} cycles in {report['wall_seconds']:.1f} s, no leaks detected")
+    else:
+        print(f"✗ Soak run failed: cycles={report['cycles']}, failures={failures}")
+    logging.getLogger("fritzbox_collector").setLevel(logging.INFO)
+except Exception as e:
+    print(f"✗ Error in soak harness test: {e}")
+
+# Test 15: Streaming device statistics and anomaly detection
+print("\n[Test 15] Testing streaming device statistics...")
+try:
+    from device_stats import DeviceStatsEngine, DeviceStatistics
+
+    engine = DeviceStatsEngine()
+    now = 1_700_000_000
+    found = []
+    for i in range(60):
+        found += engine.observe({"ain": "PLUG1", "multimeter_power": 50_000 + (i % 5) * 1000}, now + i * 300)
+    spike = engine.observe({"ain": "PLUG1", "multimeter_power": 150_000}, now + 60 * 300)
+    repeat = engine.observe({"ain": "PLUG1", "multimeter_power": 150_000}, now + 61 * 300)
+    if not found and [a["anomaly_type"] for a in spike] == ["power_spike"] and not repeat:
+        print(f"✓ Power spike detected once: {spike[0]['message']}")
+    else:
+        print(f"✗ Unexpected power anomalies: before={found}, spike={spike}, repeat={repeat}")
+
+    for i in range(40):
+        engine.observe({"ain": "FRIDGE", "multimeter_power": 60_000}, now + i * 300)
+    constant = engine.observe({"ain": "FRIDGE", "multimeter_power": 200_000}, now + 40 * 300)
+    if [a["anomaly_type"] for a in constant] == ["power_spike"] and constant[0]["zscore"] == 140:
+        print("✓ Spike on a perfectly constant device detected (stddev floored)")
+    else:
+        print(f"✗ Spike on constant device not detected: {constant}")
+
+    drift = []
+    for i in range(6):
+        drift += engine.observe({"ain": "HKR1", "hkr_is_temperature": 170, "hkr_set_temperature": 210}, now + i * 300)
+    if [a["anomaly_type"] for a in drift] == ["hkr_drift"]:
+        print("✓ Thermostat drift reported after consecutive deviations")
+    else:
+        print(f"✗ Unexpected thermostat anomalies: {drift}")
+
+    restored = DeviceStatistics(engine.devices["PLUG1"].to_dict())
+    if restored.power.count == engine.devices["PLUG1"].power.count and "power_spike" in restored.active:
+        print("✓ Statistics survive a persist/load round trip")
+    else:
+        print("✗ Statistics changed after persist/load round trip")
+except Exception as e:
+    print(f"✗ Error in device statistics test: {e}")
+
+# Test 16: WAN outage tracking
+print("\n[Test 16] Testing WAN outage tracking...")
+try:
+    from wan_outage_probe import WanOutageTracker
+
+    tracker = WanOutageTracker()
+    tracker.external_ip = "203.0.113.10"
+    statuses = ["Connected", "Connected", "Disconnected", "Connecting", "Connecting", "Connected", "Connected"]
+    outages = [o for o in (tracker.update(st, 100 + 5 * i) for i, st in enumerate(statuses)) if o]
+    if len(outages) == 1 and outages[0]["duration_s"] == 15 and outages[0]["status"] == "Disconnected":
+        print(f"✓ One outage of {outages[0]['duration_s']} s recorded from {len(statuses)} probes")
+    else:
+        print(f"✗ Unexpected outages: {outages}")
+except Exception as e:
+    print(f"✗ Error in WAN outage tracking test: {e}")
+
+try:
+    import wan_outage_probe
+    from wan_outage_probe import WanProbe
+    from fritzconnection.core.exceptions import FritzServiceError
+
+    class ProbeBox:
+        def __init__(self, error):
+            self.error = error
+            self.calls = []
+
+        def call_action(self, service, action, **kwargs):
+            self.calls.append(service)
+            if service == "WANIPConnection":
+                raise self.error
+            return {"NewConnectionStatus": "Connected"}
+
+    probe = WanProbe()
+    probe.fc = ProbeBox(ConnectionError("timed out"))
+    try:
+        probe.status()
+        transport_raised = False
+    except ConnectionError:
+        transport_raised = True
+    probe = WanProbe()
+    probe.fc = ProbeBox(FritzServiceError("unknown service"))
+    dsl = probe.status() == "Connected" and probe.service == "WANPPPConnection"
+    delays = [wan_outage_probe._backoff(n) for n in range(0, 12)]
+    bounded = delays[0] == wan_outage_probe.WAN_PROBE_INTERVAL and delays[-1] == max(
+        wan_outage_probe.WAN_PROBE_MAX_BACKOFF, wan_outage_probe.WAN_PROBE_INTERVAL
+    ) and delays == sorted(delays)
+    if transport_raised and dsl and bounded:
+        print(f"✓ Transport errors not mistaken for DSL, backoff {delays[1]:.0f} s -> {delays[-1]:.0f} s")
+    else:
+        print(f"✗ WAN probe errors: transport_raised={transport_raised}, dsl={dsl}, delays={delays}")
+except Exception as e:
+    print(f"✗ Error in WAN probe error handling test: {e}")
+
+# Test 17: Concurrent TR-064 requests within a cycle
+print("\n[Test 17] Testing concurrent TR-064 requests...")
+try:
+    import asyncio
+    import time as _time
+    from soak_test import FakeFritzBox
+    from async_tr064 import AsyncFritzClient
+    import fritzbox_collector as fcol
+
+    fcol.DECT_AINS_FILTER_SET = set()
+    timings = {}
+    results = {}
+    for concurrency in (1, 4):
+        fcol._DEVICE_MAP.clear()
+        fcol._device_map_updated = 0.0
+        box = FakeFritzBox(6, latency=0.02)
+        started = _time.perf_counter()
+        results[concurrency] = asyncio.run(fcol.get_fritz_data_async(box, concurrency=concurrency))
+        timings[concurrency] = _time.perf_counter() - started
+    same = [d["ain"] for d in results[1]["dect"]] == [d["ain"] for d in results[4]["dect"]]
+    if same and len(results[4]["dect"]) == 6 and timings[4] < timings[1] / 2:
+        print(f"✓ Cycle took {timings[1] * 1000:.0f} ms sequential, {timings[4] * 1000:.0f} ms concurrent")
+    else:
+        print(f"✗ Unexpected concurrent cycle: {timings}, same devices: {same}")
+
+    class SlowBox:
+        def call_action(self, service, action, **kwargs):
+            _time.sleep(0.5)
+            return {}
+
+    async def timed_out_call():
+        client = AsyncFritzClient(SlowBox(), concurrency=2, timeout=0.05)
+        return await client.gather(("Hosts", "GetHostNumberOfEntries", None))
+
+    outcome = asyncio.run(timed_out_call())
+    if isinstance(outcome[0], asyncio.TimeoutError):
+        print("✓ Per-call timeout cancels a hanging request")
+    else:
+        print(f"✗ Hanging request not cancelled: {outcome}")
+
+    fcol._DEVICE_MAP.clear()
+    listed = fcol._enumerate_homeauto_devices(FakeFritzBox(3), "X_AVM-DE_Homeauto1")
+    if [d["NewAIN"] for d in listed] == [f"11657 100000{i}" for i in range(3)]:
+        print("✓ Synchronous enumeration wrapper lists all devices")
+    else:
+        print(f"✗ Synchronous enumeration returned {listed}")
+
+    import benchmark_tr064
+    wide = fcol.TR064_CONCURRENCY * 2
+    capped = benchmark_tr064.measure_cycle(FakeFritzBox(wide * 2, latency=0.02), fcol.TR064_CONCURRENCY, 2)
+    result = benchmark_tr064.measure_cycle(FakeFritzBox(wide * 2, latency=0.02), wide, 2)
+    if result["median_ms"] < capped["median_ms"] * 0.8:
+        print(f"✓ Benchmark --concurrency {wide} not capped: {result['median_ms']:.0f} ms vs. "
+              f"{capped['median_ms']:.0f} ms at {fcol.TR064_CONCURRENCY}")
+    else:
+        print(f"✗ Benchmark concurrency capped: {result} vs. {capped}")
+except Exception as e:
+    print(f"✗ Error in concurrent TR-064 test: {e}")
+
+# Test 18: MQTT publishing with a local broker stand-in
+print("\n[Test 18] Testing MQTT publisher...")
+try:
+    import time as _time
+    from mqtt_publisher import MqttPublisher
+
+    class FakeBroker:
+        """Nimmt Nachrichten wie ein paho-Client entgegen und merkt sich Retained-Werte."""
+
+        class Info:
+            rc = 0
+
+        def __init__(self):
+            self.connected = False
+            self.messages = []
+            self.retained = {}
+
+        def is_connected(self):
+            return self.connected
+
+        def publish(self, topic, payload, qos=0, retain=False):
+            self.messages.append((topic, payload, qos))
+            if retain:
+                self.retained[topic] = payload
+            return self.Info()
+
+    broker = FakeBroker()
+    publisher = MqttPublisher(broker, prefix="fritzbox", qos=1, heartbeat=60, buffer_size=5).start()
+    device = {"ain": "111110000001", "state": 1, "multimeter_power": 45000}
+    queued = [
+        publisher.publish("dect/111110000001", device, now=1000),
+        publisher.publish("dect/111110000001", device, now=1010),
+        publisher.publish("dect/111110000001", device, now=1070),
+        publisher.publish("dect/111110000001", dict(device, state=0), now=1071),
+    ]
+    if queued == [True, False, True, True]:
+        print("✓ Unchanged value suppressed until heartbeat, change published immediately")
+    else:
+        print(f"✗ Unexpected publish-on-change behaviour: {queued}")
+
+    # Broker nicht erreichbar: Puffer bleibt begrenzt, Erfassung blockiert nicht
+    started = _time.perf_counter()
+    for i in range(20):
+        publisher.publish(f"dect/{i}", {"i": i}, now=2000)
+    blocked = _time.perf_counter() - started
+    broker.connected = True
+    deadline = _time.time() + 5
+    while len(broker.retained) < 5 and _time.time() < deadline:
+        _time.sleep(0.05)
+    if blocked < 0.1 and publisher.dropped >= 15 and "fritzbox/dect/19" in broker.retained:
+        print(f"✓ Buffer bounded during outage ({publisher.dropped} dropped), newest values delivered as retained QoS 1")
+    else:
+        print(f"✗ Unexpected buffer behaviour: dropped={publisher.dropped}, retained={sorted(broker.retained)}")
+
+    # Ein verworfener Wert darf nicht als gesendet gelten
+    offline = MqttPublisher(FakeBroker(), prefix="fritzbox", heartbeat=60, buffer_size=1)
+    offline.publish("wan", {"online": "Connected"}, now=3000)
+    offline.publish("speedtest", {"ping": 12}, now=3000)
+    if offline.publish("wan", {"online": "Connected"}, now=3010):
+        print("✓ Dropped value re-queued on the next cycle instead of being suppressed")
+    else:
+        print("✗ Dropped value still suppressed as already published")
+except Exception as e:
+    print(f"✗ Error in MQTT publisher test: {e}")
+
+# Test 19: Energy consumption from cumulative counters
+print("\n[Test 19] Testing energy counter deltas...")
+try:
+    from electricity_price import EnergyCounterTracker, calculate_energy_cost_wh
+
+    tracker = EnergyCounterTracker(max_power_w=3680)
+    samples = [(1000, 0), (1004, 300), (1010, 600), (3, 900), (7, 1200), (90000, 1500), (90002, 1800)]
+    deltas = [tracker.update("111110000001", wh, t) for wh, t in samples]
+    if deltas == [None, 4, 6, 3, 4, None, 2]:
+        print(f"✓ Deltas with reset and device replacement: {deltas}")
+    else:
+        print(f"✗ Unexpected energy deltas: {deltas}")
+
+    tracker.update("111110000002", 2000, 0)
+    swapped = [tracker.update("111110000002", 1500, 300), tracker.update("111110000002", 1502, 600)]
+    if swapped == [None, 2]:
+        print("✓ Implausible counter after a reset treated as device replacement")
+    else:
+        print(f"✗ Unexpected deltas after implausible reset: {swapped}")
+
+    cost = calculate_energy_cost_wh(sum(d for d in deltas if d), price=0.30)
+    if abs(cost - 0.0057) < 1e-9:
+        print(f"✓ Cost from counter deltas: {cost:.4f} EUR")
+    else:
+        print(f"✗ Unexpected cost: {cost}")
+except Exception as e:
+    print(f"✗ Error in energy counter test: {e}")
+
+# Test 20: Hot configuration reload
+print("\n[Test 20] Testing configuration reload...")
+try:
+    import tempfile
+    import threading
+    import time as _time
+    from config_reload import ConfigReloader
+    import fritzbox_collector as fcol
+
+    conf_path = os.path.join(tempfile.mkdtemp(), "fritzbox_collector.conf")
+    reloader = ConfigReloader({"COLLECT_INTERVAL": 300, "DECT_AINS": []}, path=conf_path)
+    first = reloader.poll()
+
+    with open(conf_path, "w") as f:
+        f.write("# Test\nCOLLECT_INTERVAL=60\nDECT_AINS=11111 0000002, 11111 0000003\n")
+    changed = reloader.poll()
+    unchanged = reloader.poll()
+    if first == {} and changed == {"COLLECT_INTERVAL": 60, "DECT_AINS": ["11111 0000002", "11111 0000003"]} and unchanged == {}:
+        print(f"✓ File change detected and validated: {sorted(changed)}")
+    else:
+        print(f"✗ Unexpected reload result: {first}, {changed}, {unchanged}")
+
+    with open(conf_path, "w") as f:
+        f.write("COLLECT_INTERVAL=30\nSPEEDTEST_INTERVAL=-5\n")
+    rejected = reloader.poll()
+    if rejected == {} and reloader.config["COLLECT_INTERVAL"] == 60:
+        print("✓ Invalid file rejected as a whole, previous config kept")
+    else:
+        print(f"✗ Invalid config partially applied: {rejected}, {reloader.config}")
+
+    with open(conf_path, "w") as f:
+        f.write("DECT_AINS=11111 0000002\n")
+    reloader.request_reload()
+    reverted = reloader.poll()
+    if reverted == {"COLLECT_INTERVAL": 300, "DECT_AINS": ["11111 0000002"]}:
+        print("✓ Removed key falls back to environment value on SIGHUP reload")
+    else:
+        print(f"✗ Unexpected fallback: {reverted}")
+
+    fcol._DEVICE_MAP.clear()
+    fcol._DEVICE_MAP.update({"111110000002": {"ain": "11111 0000002", "index": 1}})
+    fcol._device_map_updated = 1000.0
+    fcol._apply_config({"DECT_AINS": ["11111 0000002"]})
+    kept = fcol._device_map_updated == 1000.0 and fcol.DECT_AINS_FILTER_SET == {"111110000002"}
+    kept = kept and not fcol._force_discovery
+    fcol._apply_config({"DECT_AINS": ["11111 0000002", "11111 0000009"]})
+    if (kept and fcol._force_discovery and fcol._device_map_updated == 1000.0
+            and "111110000002" in fcol._DEVICE_MAP):
+        print("✓ Filter applied live; device map kept, rediscovery only for unknown AINs")
+    else:
+        print(f"✗ Unexpected filter reload: {fcol.DECT_AINS_FILTER_SET}, {fcol._force_discovery}")
+    fcol._update_device_map([{"NewAIN": "11111 0000002"}, {"NewAIN": "11111 0000009"}])
+    if not fcol._force_discovery:
+        print("✓ Forced rediscovery cleared after the next full enumeration")
+    else:
+        print("✗ Forced rediscovery still pending after enumeration")
+
+    with open(conf_path, "w") as f:
+        f.write("ELECTRICITY_PRICE_EUR_PER_KWH=0.32\n")
+    restarted = ConfigReloader({"ELECTRICITY_PRICE_EUR_PER_KWH": 0.30}, path=conf_path,
+                               current={"ELECTRICITY_PRICE_EUR_PER_KWH": 0.32})
+    if restarted.poll() == {}:
+        print("✓ Price already active in the database is not reported as a change after restart")
+    else:
+        print(f"✗ Active price reported as change: {restarted.config}")
+
+    started = _time.monotonic()
+    threading.Timer(0.1, restarted.request_reload).start()
+    woken = restarted.wait(30)
+    waited = _time.monotonic() - started
+    if woken and waited < 5:
+        print(f"✓ SIGHUP interrupts the wait between cycles after {waited:.2f} s")
+    else:
+        print(f"✗ Wait not interrupted by reload request: woken={woken}, waited={waited:.1f} s")
+except Exception as e:
+    print(f"✗ Error in configuration reload test: {e}")
+
 # Summary
 print("\n" + "=" * 60)
 print("Test Summary")
@@ -0,0 +1,246 @@
+"""
+WAN Outage Probe Module
+
+Leichter Prüf-Loop für den WAN-Status: eine einzige, wiederverwendete
+FritzConnection fragt alle paar Sekunden nur GetStatusInfo (Kabel) bzw.
+GetStatus (DSL) ab. Statuswechsel werden im Speicher verfolgt; pro Ausfall wird
+genau eine Zeile (Beginn, Ende, Dauer, neue externe IP) in wan_outages
+geschrieben statt vieler Statuszeilen.
+"""
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+import mysql.connector
+from fritzconnection import FritzConnection
+from fritzconnection.core.exceptions import FritzConnectionException
+from async_tr064 import TR064_CALL_TIMEOUT
+from notify import notify_all
+
+logger = logging.getLogger(__name__)
+
+FRITZBOX_HOST = os.getenv("FRITZBOX_HOST", "192.168.178.1")
+FRITZBOX_USER = os.getenv("FRITZBOX_USER", "deinuser")
+FRITZBOX_PASSWORD = os.getenv("FRITZBOX_PASSWORD", "deinpasswort")
+
+# Prüfintervall in Sekunden (0 = deaktiviert)
+WAN_PROBE_INTERVAL = float(os.getenv("WAN_PROBE_INTERVAL", "5"))
+
+# Längste Wartezeit zwischen zwei Prüfungen, solange die FritzBox nicht antwortet (Sekunden)
+WAN_PROBE_MAX_BACKOFF = float(os.getenv("WAN_PROBE_MAX_BACKOFF", "60"))
+
+CONNECTED = "Connected"
+
+# SQL-Konfiguration (wird von fritzbox_collector.py übernommen)
+SQL_CONFIG = {
+    "user": os.getenv("SQL_USER", "sqluser"),
+    "password": os.getenv("SQL_PASSWORD", "sqlpass"),
+    "host": os.getenv("SQL_HOST", "sqlhost"),
+    "database": os.getenv("SQL_DB", "sqldb"),
+    "autocommit": True
+}
+
+
+def create_wan_outages_table():
+    """Erstellt die Tabelle für WAN-Ausfälle, falls sie nicht existiert."""
+    logger.info("Prüfe und erstelle ggf. wan_outages Tabelle...")
+    table_sql = """CREATE TABLE IF NOT EXISTS wan_outages (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        start_time DATETIME(3),
+        end_time DATETIME(3),
+        duration_s FLOAT,
+        status VARCHAR(32),
+        old_external_ip VARCHAR(64),
+        new_external_ip VARCHAR(64),
+        time DATETIME
+    )"""
+
+    try:
+        conn = mysql.connector.connect(**SQL_CONFIG)
+        cursor = conn.cursor()
+        cursor.execute(table_sql)
+        cursor.close()
+        conn.close()
+        logger.info("wan_outages Tabelle wurde geprüft/erstellt.")
+    except Exception as e:
+        logger.error("Fehler bei wan_outages Tabellenprüfung/-erstellung: %s", e)
+        notify_all(f"WAN-Ausfall-Tabelle konnte nicht angelegt werden: {e}")
+        raise
+
+
+class WanOutageTracker:
+    """Verfolgt Statuswechsel und liefert pro abgeschlossenem Ausfall einen Datensatz."""
+
+    def __init__(self):
+        self.status = None
+        self.outage_start = None
+        self.outage_status = None
+        self.external_ip = None
+
+    def update(self, status, now):
+        """
+        Verarbeitet einen Statuswert.
+
+        Returns:
+            dict: Abgeschlossener Ausfall (start, end, duration_s, status, old_external_ip)
+                  oder None, solange kein Ausfall endet
+        """
+        previous = self.status
+        self.status = status
+        if status != CONNECTED:
+            if self.outage_start is None and previous is not None:
+                self.outage_start = now
+                self.outage_status = status
+                logger.warning("WAN-Verbindung unterbrochen (Status: %s)", status)
+            return None
+        if self.outage_start is None:
+            return None
+        outage = {
+            "start": self.outage_start,
+            "end": now,
+            "duration_s": now - self.outage_start,
+            "status": self.outage_status,
+            "old_external_ip": self.external_ip,
+        }
+        self.outage_start = None
+        self.outage_status = None
+        return outage
+
+
+class WanProbe:
+    """Hält eine FritzConnection und merkt sich, ob Kabel- oder DSL-Service antwortet."""
+
+    def __init__(self):
+        self.fc = None
+        self.service = None
+
+    def _connection(self):
+        if self.fc is None:
+            self.fc = FritzConnection(
+                address=FRITZBOX_HOST, user=FRITZBOX_USER, password=FRITZBOX_PASSWORD, timeout=TR064_CALL_TIMEOUT
+            )
+        return self.fc
+
+    def status(self):
+        fc = self._connection()
+        if self.service != "WANPPPConnection":
+            try:
+                result = fc.call_action("WANIPConnection", "GetStatusInfo")["NewConnectionStatus"]
+                self.service = "WANIPConnection"
+                return result
+            except FritzConnectionException:
+                # Nur ein fehlender/abgelehnter Service spricht für DSL – Transportfehler durchreichen
+                if self.service == "WANIPConnection":
+                    raise
+        result = fc.call_action("WANPPPConnection", "GetStatus")["NewConnectionStatus"]
+        self.service = "WANPPPConnection"
+        return result
+
+    def external_ip(self):
+        return self._connection().call_action(self.service, "GetExternalIPAddress")["NewExternalIPAddress"]
+
+    def reset(self):
+        """Verwirft die Verbindung; die Beschreibungen werden beim nächsten Aufruf neu geladen."""
+        self.fc = None
+        self.service = None
+
+
+def write_outage_to_sql(outage):
+    """Schreibt einen abgeschlossenen WAN-Ausfall in die Tabelle wan_outages."""
+    for attempt in range(3):
+        try:
+            conn = mysql.connector.connect(**SQL_CONFIG)
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                INSERT INTO wan_outages (
+                    start_time, end_time, duration_s, status, old_external_ip, new_external_ip, time
+                )
+                VALUES (%s, %s, %s, %s, %s, %s, NOW())
+                """,
+                (
+                    datetime.fromtimestamp(outage["start"]),
+                    datetime.fromtimestamp(outage["end"]),
+                    outage["duration_s"],
+                    outage["status"],
+                    outage["old_external_ip"],
+                    outage["new_external_ip"],
+                )
+            )
+            cursor.close()
+            conn.close()
+            return
+        except Exception as e:
+            logger.error("Fehler beim Schreiben des WAN-Ausfalls (Versuch %s): %s", attempt+1, e)
+            time.sleep(10)
+    logger.error("WAN-Ausfall konnte nach 3 Versuchen nicht geschrieben werden.")
+
+
+def wan_probe_loop(should_run=None, on_status=None):
+    """
+    Endlosschleife: prüft den WAN-Status und protokolliert Ausfälle.
+
+    Args:
+        should_run: Optionale Funktion, die angibt, ob diese Replika zuständig ist
+        on_status: Optionaler Callback (status, external_ip) nach jeder erfolgreichen Prüfung
+    """
+    probe = WanProbe()
+    tracker = WanOutageTracker()
+    failures = 0
+    while True:
+        if should_run is not None and not should_run():
+            tracker = WanOutageTracker()
+            time.sleep(WAN_PROBE_INTERVAL)
+            continue
+        try:
+            now = time.time()
+            outage = tracker.update(probe.status(), now)
+            if tracker.external_ip is None and tracker.status == CONNECTED:
+                tracker.external_ip = probe.external_ip()
+            if outage:
+                try:
+                    outage["new_external_ip"] = probe.external_ip()
+                except Exception as e:
+                    logger.error("Externe IP nach WAN-Ausfall nicht abrufbar: %s", e)
+                    outage["new_external_ip"] = None
+                tracker.external_ip = outage["new_external_ip"]
+                logger.warning(
+                    "WAN-Verbindung nach %.1f s wiederhergestellt, externe IP: %s",
+                    outage["duration_s"], outage["new_external_ip"]
+                )
+                notify_all(
+                    f"WAN-Ausfall von {outage['duration_s']:.0f} s beendet, neue IP: {outage['new_external_ip']}"
+                )
+                write_outage_to_sql(outage)
+            if on_status is not None:
+                on_status(tracker.status, tracker.external_ip)
+            if failures:
+                logger.info("WAN-Prüfung wieder erfolgreich nach %s Fehler(n) in Folge.", failures)
+            failures = 0
+        except Exception as e:
+            # FritzBox nicht erreichbar sagt nichts über das WAN aus - Zustand beibehalten
+            failures += 1
+            logger.error("WAN-Prüfung fehlgeschlagen (%s. Fehler in Folge): %s", failures, e)
+            if not isinstance(e, FritzConnectionException):
+                # Nur bei Transportfehlern neu verbinden; Aktions-/Rechtefehler liefern
+                # auch mit neuer Verbindung (und neu geladenen Beschreibungen) dasselbe
+                probe.reset()
+        time.sleep(_backoff(failures))
+
+
+def _backoff(failures):
+    """Wartezeit bis zur nächsten Prüfung: verdoppelt sich pro Fehler in Folge bis WAN_PROBE_MAX_BACKOFF."""
+    if failures == 0:
+        return WAN_PROBE_INTERVAL
+    return min(WAN_PROBE_INTERVAL * 2 ** min(failures, 16), max(WAN_PROBE_MAX_BACKOFF, WAN_PROBE_INTERVAL))
+
+
+def start_wan_outage_probe(should_run=None, on_status=None):
+    """Startet die WAN-Ausfallprüfung im Hintergrund, sofern WAN_PROBE_INTERVAL > 0."""
+    if WAN_PROBE_INTERVAL <= 0:
+        return None
+    thread = threading.Thread(target=wan_probe_loop, args=(should_run, on_status), name="wan-probe", daemon=True)
+    thread.start()
+    logger.info("WAN-Ausfallprüfung gestartet (alle %s s).", WAN_PROBE_INTERVAL)
+    return thread
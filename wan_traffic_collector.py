@@ -0,0 +1,306 @@
+"""
+WAN Traffic Collector Module
+
+Tastet die WAN-Byte-Zähler (64 Bit über WANCommonIFC1, sonst die 32-Bit-Zähler
+aus WANCommonInterfaceConfig) in kurzem Abstand ab,
+berechnet daraus Datenraten im Prozess und schreibt pro Intervall aggregierte
+Up-/Download-Bytes und Spitzenraten in die Tabelle wan_traffic.
+"""
+import os
+import time
+import logging
+import threading
+import mysql.connector
+from fritzconnection import FritzConnection
+from fritzconnection.core.exceptions import FritzConnectionException
+from notify import notify_all
+
+logger = logging.getLogger(__name__)
+
+FRITZBOX_HOST = os.getenv("FRITZBOX_HOST", "192.168.178.1")
+FRITZBOX_USER = os.getenv("FRITZBOX_USER", "deinuser")
+FRITZBOX_PASSWORD = os.getenv("FRITZBOX_PASSWORD", "deinpasswort")
+
+# Abtastintervall in Sekunden (0 = deaktiviert) und Aggregationsintervall für die DB
+WAN_TRAFFIC_INTERVAL = int(os.getenv("WAN_TRAFFIC_INTERVAL", "10"))
+WAN_TRAFFIC_AGGREGATE_INTERVAL = int(os.getenv("WAN_TRAFFIC_AGGREGATE_INTERVAL", "300"))
+
+# Längste Wartezeit zwischen zwei Versuchen, solange die Abfrage fehlschlägt (Sekunden)
+WAN_TRAFFIC_MAX_BACKOFF = int(os.getenv("WAN_TRAFFIC_MAX_BACKOFF", "300"))
+
+# Die klassischen TR-064-Zähler sind 32 Bit breit und laufen bei 4 GiB über
+COUNTER_32BIT_MAX = 2 ** 32
+
+# SQL-Konfiguration (wird von fritzbox_collector.py übernommen)
+SQL_CONFIG = {
+    "user": os.getenv("SQL_USER", "sqluser"),
+    "password": os.getenv("SQL_PASSWORD", "sqlpass"),
+    "host": os.getenv("SQL_HOST", "sqlhost"),
+    "database": os.getenv("SQL_DB", "sqldb"),
+    "autocommit": True
+}
+
+
+def create_wan_traffic_table():
+    """Erstellt die Tabelle für aggregierte WAN-Traffic-Daten, falls sie nicht existiert."""
+    logger.info("Prüfe und erstelle ggf. wan_traffic Tabelle...")
+    table_sql = """CREATE TABLE IF NOT EXISTS wan_traffic (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        interval_start DATETIME,
+        duration_s INT,
+        bytes_down BIGINT,
+        bytes_up BIGINT,
+        avg_down_rate FLOAT,
+        avg_up_rate FLOAT,
+        peak_down_rate FLOAT,
+        peak_up_rate FLOAT,
+        samples INT,
+        counter_resets INT,
+        time DATETIME
+    )"""
+
+    try:
+        conn = mysql.connector.connect(**SQL_CONFIG)
+        cursor = conn.cursor()
+        cursor.execute(table_sql)
+        cursor.close()
+        conn.close()
+        logger.info("wan_traffic Tabelle wurde geprüft/erstellt.")
+    except Exception as e:
+        logger.error("Fehler bei wan_traffic Tabellenprüfung/-erstellung: %s", e)
+        notify_all(f"WAN-Traffic-Tabelle konnte nicht angelegt werden: {e}")
+        raise
+
+
+def counter_delta(previous, current, wraps_at=COUNTER_32BIT_MAX):
+    """
+    Berechnet die Differenz zweier Zählerstände unter Berücksichtigung von Überlauf und Reset.
+
+    Args:
+        previous (int): Vorheriger Zählerstand
+        current (int): Aktueller Zählerstand
+        wraps_at (int): Überlaufgrenze des Zählers oder None bei 64-Bit-Zählern
+
+    Returns:
+        tuple: (Delta in Bytes, True falls ein Reset erkannt wurde)
+    """
+    if previous is None or current is None:
+        return 0, False
+    if current >= previous:
+        return current - previous, False
+    # Zähler ist kleiner geworden: Überlauf nur plausibel, wenn der alte Stand
+    # im oberen Viertel des Wertebereichs lag, sonst Neustart der FritzBox
+    if wraps_at and wraps_at * 3 // 4 < previous < wraps_at:
+        return current + wraps_at - previous, False
+    return current, True
+
+
+def read_traffic_counters(fc):
+    """
+    Liest die WAN-Byte-Zähler (bevorzugt 64 Bit) und die Online-Monitor-Spitzenwerte.
+
+    Returns:
+        dict: received/sent (Bytes), wraps_at sowie monitor_down/monitor_up (Bytes/s oder None)
+    """
+    counters = {"wraps_at": None, "monitor_down": None, "monitor_up": None}
+    received = sent = None
+    try:
+        # 64-Bit-Zähler gibt es nur über den IGD-Service (wie FritzStatus.bytes_received)
+        info = fc.call_action("WANCommonIFC1", "GetAddonInfos")
+        received = info.get("NewX_AVM_DE_TotalBytesReceived64")
+        sent = info.get("NewX_AVM_DE_TotalBytesSent64")
+    except FritzConnectionException as e:
+        logger.debug("WANCommonIFC1.GetAddonInfos nicht verfügbar: %s", e)
+    if received is None or sent is None:
+        # Ältere Firmware oder IGD deaktiviert: 32-Bit-Zähler aus TR-064
+        received = fc.call_action("WANCommonInterfaceConfig", "GetTotalBytesReceived")["NewTotalBytesReceived"]
+        sent = fc.call_action("WANCommonInterfaceConfig", "GetTotalBytesSent")["NewTotalBytesSent"]
+        counters["wraps_at"] = COUNTER_32BIT_MAX
+    counters["received"] = int(received)
+    counters["sent"] = int(sent)
+
+    try:
+        monitor = fc.call_action(
+            "WANCommonInterfaceConfig", "X_AVM-DE_GetOnlineMonitor", NewSyncGroupIndex=0
+        )
+        counters["monitor_down"] = _max_of_csv(monitor.get("Newds_current_bps"))
+        counters["monitor_up"] = _max_of_csv(monitor.get("Newus_current_bps"))
+    except Exception as e:
+        logger.debug("X_AVM-DE_GetOnlineMonitor nicht verfügbar: %s", e)
+    return counters
+
+
+def _max_of_csv(value):
+    """Größter Wert aus einer kommagetrennten Zahlenliste des Online-Monitors."""
+    try:
+        numbers = [int(v) for v in str(value or "").split(",") if v.strip()]
+    except ValueError:
+        return None
+    return max(numbers) if numbers else None
+
+
+class WanTrafficAggregator:
+    """Sammelt Zählerstände und verdichtet sie zu einem Datensatz pro Intervall."""
+
+    def __init__(self):
+        self.last_sample = None
+        self.last_time = None
+        self._reset_interval(time.time())
+
+    def _reset_interval(self, now):
+        self.interval_start = now
+        self.bytes_down = 0
+        self.bytes_up = 0
+        self.peak_down_rate = 0.0
+        self.peak_up_rate = 0.0
+        self.samples = 0
+        self.counter_resets = 0
+
+    def add_sample(self, counters, now):
+        """Verarbeitet einen Zählerstand und aktualisiert Summen und Spitzenraten."""
+        if self.last_sample is not None and self.last_sample["wraps_at"] != counters["wraps_at"]:
+            # Zählerquelle gewechselt (64 <-> 32 Bit): Stände nicht vergleichbar, neu aufsetzen
+            logger.info("WAN-Zählerquelle gewechselt – Abtastung setzt neu auf.")
+        elif self.last_sample is not None:
+            elapsed = now - self.last_time
+            wraps_at = counters["wraps_at"]
+            down, reset_down = counter_delta(self.last_sample["received"], counters["received"], wraps_at)
+            up, reset_up = counter_delta(self.last_sample["sent"], counters["sent"], wraps_at)
+            if reset_down or reset_up:
+                self.counter_resets += 1
+                logger.info("WAN-Zähler zurückgesetzt (Neustart der FritzBox?)")
+            self.bytes_down += down
+            self.bytes_up += up
+            if elapsed > 0:
+                self.peak_down_rate = max(self.peak_down_rate, down / elapsed)
+                self.peak_up_rate = max(self.peak_up_rate, up / elapsed)
+            self.samples += 1
+        if counters.get("monitor_down") is not None:
+            self.peak_down_rate = max(self.peak_down_rate, float(counters["monitor_down"]))
+        if counters.get("monitor_up") is not None:
+            self.peak_up_rate = max(self.peak_up_rate, float(counters["monitor_up"]))
+        self.last_sample = counters
+        self.last_time = now
+
+    def flush(self, now):
+        """Liefert den Datensatz des abgelaufenen Intervalls und beginnt ein neues."""
+        duration = max(now - self.interval_start, 0)
+        record = {
+            "interval_start": self.interval_start,
+            "duration_s": int(round(duration)),
+            "bytes_down": self.bytes_down,
+            "bytes_up": self.bytes_up,
+            "avg_down_rate": self.bytes_down / duration if duration else None,
+            "avg_up_rate": self.bytes_up / duration if duration else None,
+            "peak_down_rate": self.peak_down_rate,
+            "peak_up_rate": self.peak_up_rate,
+            "samples": self.samples,
+            "counter_resets": self.counter_resets,
+        }
+        self._reset_interval(now)
+        return record
+
+
+def write_wan_traffic_to_sql(record):
+    """
+    Schreibt einen aggregierten WAN-Traffic-Datensatz in die Datenbank.
+
+    Args:
+        record (dict): Ergebnis von WanTrafficAggregator.flush()
+    """
+    if not record or not record["samples"]:
+        logger.warning("Keine WAN-Traffic-Daten zum Speichern vorhanden")
+        return
+
+    for attempt in range(3):
+        try:
+            conn = mysql.connector.connect(**SQL_CONFIG)
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                INSERT INTO wan_traffic (
+                    interval_start, duration_s, bytes_down, bytes_up, avg_down_rate, avg_up_rate,
+                    peak_down_rate, peak_up_rate, samples, counter_resets, time
+                )
+                VALUES (FROM_UNIXTIME(%s), %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
+                """,
+                (
+                    int(record["interval_start"]),
+                    record["duration_s"],
+                    record["bytes_down"],
+                    record["bytes_up"],
+                    record["avg_down_rate"],
+                    record["avg_up_rate"],
+                    record["peak_down_rate"],
+                    record["peak_up_rate"],
+                    record["samples"],
+                    record["counter_resets"],
+                )
+            )
+            cursor.close()
+            conn.close()
+            logger.info(
+                "WAN-Traffic gespeichert: Down=%s B, Up=%s B, Peak Down=%.0f B/s, Peak Up=%.0f B/s",
+                record["bytes_down"], record["bytes_up"], record["peak_down_rate"], record["peak_up_rate"]
+            )
+            return
+        except Exception as e:
+            logger.error("Fehler beim Schreiben WAN-Traffic in DB (Versuch %s): %s", attempt+1, e)
+            notify_all(f"Fehler beim Schreiben WAN-Traffic-Daten: {e}")
+            time.sleep(10)
+    logger.error("WAN-Traffic-Daten konnten nach 3 Versuchen nicht geschrieben werden.")
+
+
+def wan_traffic_loop(should_run=None):
+    """
+    Endlosschleife: tastet die Zähler ab und schreibt pro Aggregationsintervall einen Datensatz.
+
+    Args:
+        should_run (callable): Optional; liefert False, solange eine andere Replika die FritzBox bearbeitet
+    """
+    aggregator = WanTrafficAggregator()
+    fc = None
+    failures = 0
+    while True:
+        now = time.time()
+        if should_run is not None and not should_run():
+            # Nicht zuständig: Zustand verwerfen, damit nach Übernahme neu begonnen wird
+            aggregator = WanTrafficAggregator()
+            time.sleep(WAN_TRAFFIC_INTERVAL)
+            continue
+        try:
+            if fc is None:
+                fc = FritzConnection(address=FRITZBOX_HOST, user=FRITZBOX_USER, password=FRITZBOX_PASSWORD)
+            aggregator.add_sample(read_traffic_counters(fc), now)
+            failures = 0
+        except Exception as e:
+            failures += 1
+            logger.error("Fehler beim Abfragen der WAN-Traffic-Zähler (%s. Fehler in Folge): %s", failures, e)
+            if not isinstance(e, FritzConnectionException):
+                # Nur bei Transportfehlern neu verbinden; Aktions-/Servicefehler liefern
+                # auch mit neuer Verbindung (und neu geladenen Beschreibungen) dasselbe
+                fc = None
+        if now - aggregator.interval_start >= WAN_TRAFFIC_AGGREGATE_INTERVAL:
+            write_wan_traffic_to_sql(aggregator.flush(now))
+        time.sleep(_backoff(failures))
+
+
+def _backoff(failures):
+    """Wartezeit bis zur nächsten Abtastung: verdoppelt sich pro Fehler in Folge bis WAN_TRAFFIC_MAX_BACKOFF."""
+    if failures == 0:
+        return WAN_TRAFFIC_INTERVAL
+    return min(WAN_TRAFFIC_INTERVAL * 2 ** min(failures, 16), max(WAN_TRAFFIC_MAX_BACKOFF, WAN_TRAFFIC_INTERVAL))
+
+
+def start_wan_traffic_collector(should_run=None):
+    """Startet die WAN-Traffic-Abtastung im Hintergrund, sofern WAN_TRAFFIC_INTERVAL > 0."""
+    if WAN_TRAFFIC_INTERVAL <= 0:
+        logger.info("WAN-Traffic-Abtastung deaktiviert (WAN_TRAFFIC_INTERVAL=0).")
+        return None
+    thread = threading.Thread(target=wan_traffic_loop, args=(should_run,), name="wan-traffic", daemon=True)
+    thread.start()
+    logger.info(
+        "WAN-Traffic-Abtastung gestartet (alle %s s, Aggregation alle %s s).",
+        WAN_TRAFFIC_INTERVAL, WAN_TRAFFIC_AGGREGATE_INTERVAL
+    )
+    return thread
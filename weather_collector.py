@@ -168,3 +168,4 @@ def collect_weather():
     weather_data = fetch_weather_data()
     if weather_data:
         write_weather_to_sql(weather_data)
+    return weather_data